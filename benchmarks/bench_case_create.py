@@ -0,0 +1,51 @@
+"""Benchmark hms.case creation: one create per case vs one batched create.
+
+Run inside an Odoo shell on a database with the ``hms`` module installed::
+
+    odoo-bin shell -d <db> < benchmarks/bench_case_create.py
+
+Cases are created for the existing medical records and doctors, inside a
+savepoint that is rolled back after each run. Admissions are spread one
+hour apart from 2000-01-01 so they never hit the doctor overlap constraint.
+Nothing is committed.
+"""
+import time
+from datetime import datetime, timedelta
+
+CASES = 1_000
+
+cr = env.cr  # noqa: F821 - provided by odoo shell
+
+
+def case_vals():
+    records = env['hms.medical.record'].search([], limit=CASES)  # noqa: F821
+    doctors = env['hms.role'].get_employees('doctor')  # noqa: F821
+    if not records or not doctors:
+        raise SystemExit("Need at least one medical record and one doctor to create cases.")
+    return [{
+        'medical_record_id': records[i % len(records)].id,
+        'main_doctor_id': doctors[i % len(doctors)].id,
+        'state': 'active',
+        'admission_date': datetime(2000, 1, 1) + timedelta(hours=i),
+    } for i in range(CASES)]
+
+
+def measure(label, func):
+    env.invalidate_all()  # noqa: F821
+    queries = cr.sql_log_count
+    started = time.perf_counter()
+    with cr.savepoint(flush=False) as savepoint:
+        func()
+        env.flush_all()  # noqa: F821
+        elapsed = time.perf_counter() - started
+        savepoint.rollback()
+    env.invalidate_all()  # noqa: F821
+    print(f"{label:<8} {CASES} cases  {cr.sql_log_count - queries:>7} queries  {elapsed:8.2f} s")
+
+
+vals_list = case_vals()
+Case = env['hms.case']  # noqa: F821
+
+measure("single", lambda: [Case.create(vals) for vals in vals_list])
+measure("batch", lambda: Case.create(vals_list))
+cr.rollback()
@@ -0,0 +1,90 @@
+"""Benchmark the HMS dashboard KPIs: one search_count per KPI vs the grouped query.
+
+Run inside an Odoo shell on a database with the ``hms`` module installed::
+
+    odoo-bin shell -d <db> < benchmarks/bench_dashboard.py
+
+The database is topped up to ``CASES`` cases with plain SQL inserts, so run it
+on a throw-away copy. Nothing is committed.
+"""
+import time
+from datetime import timedelta
+
+from odoo import fields
+
+CASES = 100_000
+ROUNDS = 5
+
+cr = env.cr  # noqa: F821 - provided by odoo shell
+
+
+def seed():
+    """Insert the missing cases, admitted one hour apart per doctor so they respect hms_case_doctor_no_overlap."""
+    cr.execute("SELECT COUNT(*) FROM hms_case")
+    missing = CASES - cr.fetchone()[0]
+    if missing <= 0:
+        return
+    cr.execute("SELECT id FROM hms_medical_record ORDER BY id LIMIT 1")
+    record = cr.fetchone()
+    cr.execute("""SELECT e.id FROM hr_employee e JOIN hms_role r ON r.id = e.hms_role_id
+                  WHERE r.code = 'doctor' ORDER BY e.id""")
+    doctors = [row[0] for row in cr.fetchall()]
+    if not record or not doctors:
+        raise SystemExit("Need at least one medical record and one doctor to seed cases.")
+    cr.execute("""
+        INSERT INTO hms_case (name, medical_record_id, main_doctor_id, state, admission_date, create_date, write_date)
+        SELECT 'BENCH/' || g, %s, (%s::int[])[1 + g %% %s],
+               (ARRAY['draft', 'active', 'closed'])[1 + g %% 3],
+               now() at time zone 'UTC' - (g / %s) * interval '1 hour',
+               now() at time zone 'UTC', now() at time zone 'UTC'
+        FROM generate_series(1, %s) g
+    """, (record[0], doctors, len(doctors), len(doctors), missing))
+    print(f"seeded {missing} cases")
+
+
+def legacy_counts(employee_id, start, end):
+    """The per-KPI search_count calls the dashboard used to issue."""
+    Case, Appt = env['hms.case'], env['hms.appointment']  # noqa: F821
+    LabReq, LabRes = env['hms.lab.request'], env['hms.lab.result']  # noqa: F821
+    today = [('date', '>=', start), ('date', '<', end)]
+    return [
+        Case.search_count([('main_doctor_id', '=', employee_id), ('state', '=', 'active')]),
+        Appt.search_count([('doctor_id', '=', employee_id), ('state', '=', 'confirmed')] + today),
+        LabRes.search_count([('case_id.main_doctor_id', '=', employee_id), ('lab_request_line_id.lab_request_id.state', '=', 'completed')]),
+        Case.search_count([('consulting_doctor_ids', '=', employee_id), ('state', 'in', ['draft', 'active'])]),
+        Case.search_count([('nurse_id', '=', employee_id), ('state', '=', 'active')]),
+        Appt.search_count([('case_id.nurse_id', '=', employee_id)] + today),
+        LabRes.search_count([('case_id.nurse_id', '=', employee_id), ('lab_request_id.state', '=', 'draft')]),
+        LabReq.search_count([('state', '=', 'draft')]),
+        LabRes.search_count([('lab_request_id.state', '=', 'completed')]),
+        LabReq.search_count([('date_requested', '>=', start), ('date_requested', '<', end)]),
+        env['hms.prescription'].search_count([('state', '=', 'confirmed')]),  # noqa: F821
+        env['res.partner'].search_count([('is_patient', '=', True), ('create_date', '>=', start), ('create_date', '<', end)]),  # noqa: F821
+        Appt.search_count(today),
+        Case.search_count([('state', '=', 'active')]),
+        Case.search_count([('state', '=', 'active'), ('admission_date', '>=', start), ('admission_date', '<', end)]),
+    ]
+
+
+def measure(label, func):
+    env.invalidate_all()  # noqa: F821
+    queries = cr.sql_log_count
+    started = time.perf_counter()
+    for _round in range(ROUNDS):
+        func()
+    elapsed = (time.perf_counter() - started) / ROUNDS * 1000
+    print(f"{label:<12} {(cr.sql_log_count - queries) // ROUNDS:>4} queries  {elapsed:8.2f} ms")
+
+
+seed()
+env['hms.case'].flush_model()  # noqa: F821
+cr.execute("SELECT id FROM hr_employee ORDER BY id LIMIT 1")
+employee_id = cr.fetchone()[0]
+start = fields.Datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+end = start + timedelta(days=1)
+Dashboard = env['hms.dashboard']  # noqa: F821
+
+measure("search_count", lambda: legacy_counts(employee_id, start, end))
+measure("grouped", lambda: Dashboard._get_kpi_counts(
+    ['doctor', 'nurse', 'lab', 'chemist', 'reception'], employee_id, start, end))
+cr.rollback()
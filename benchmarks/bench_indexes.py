@@ -0,0 +1,139 @@
+"""Benchmark the HMS hot-path queries with and without the declared indexes.
+
+Run inside an Odoo shell on a database with the ``hms`` module installed::
+
+    odoo-bin shell -d <db> < benchmarks/bench_indexes.py
+
+A dataset of appointments, cases, lab requests, prescriptions and notes is
+generated with ``generate_series`` for the existing patients, medical
+records and doctors. Every query is then run under ``EXPLAIN ANALYZE`` with
+the indexes, and again after dropping them in a savepoint. Nothing is
+committed.
+"""
+import time
+
+from odoo.tools import SQL
+
+ROWS = 200_000
+RUNS = 5
+
+# Indexes added for the hot paths, dropped for the "before" measures.
+INDEXES = (
+    'hms_appointment_doctor_date_state_idx',
+    'hms_case_main_doctor_state_admission_idx',
+    'hms_case_open_admission_idx',
+    'hms_lab_request_state_date_requested_idx',
+    'hms_prescription_state_date_idx',
+    'hms_lab_result__patient_id_index',
+    'hms_note_case_note_type_idx',
+)
+
+cr = env.cr  # noqa: F821 - provided by odoo shell
+
+
+def generate():
+    """Insert ``ROWS`` records per table, spread one hour apart per doctor."""
+    doctors = env['hms.role'].get_employees('doctor').ids  # noqa: F821
+    records = env['hms.medical.record'].search([]).ids  # noqa: F821
+    patients = env['hms.medical.record'].browse(records).patient_id.ids  # noqa: F821
+    if not doctors or not records:
+        raise SystemExit("Need at least one medical record and one doctor to generate the dataset.")
+    params = {'rows': ROWS, 'doctors': doctors, 'records': records, 'patients': patients, 'uid': env.uid}  # noqa: F821
+    cr.execute(SQL(
+        """
+        INSERT INTO hms_appointment (name, patient_id, doctor_id, date, expected_end, state)
+        SELECT 'BENCH/' || i, (%(patients)s::int[])[1 + i %% cardinality(%(patients)s::int[])],
+               (%(doctors)s::int[])[1 + i %% cardinality(%(doctors)s::int[])],
+               timestamp '1990-01-01' + i * interval '1 hour',
+               timestamp '1990-01-01' + i * interval '1 hour' + interval '30 minutes',
+               (ARRAY['draft', 'confirmed', 'done', 'canceled'])[1 + i %% 4]
+          FROM generate_series(1, %(rows)s) AS i
+        """, **params))
+    cr.execute(SQL(
+        """
+        INSERT INTO hms_case (name, medical_record_id, patient_id, main_doctor_id, admission_date, state)
+        SELECT 'BENCH/' || i, r.id, r.patient_id,
+               (%(doctors)s::int[])[1 + i %% cardinality(%(doctors)s::int[])],
+               timestamp '1990-01-01' + i * interval '1 hour',
+               CASE WHEN i %% 20 = 0 THEN 'active' WHEN i %% 20 = 1 THEN 'draft' ELSE 'closed' END
+          FROM generate_series(1, %(rows)s) AS i
+          JOIN hms_medical_record r ON r.id = (%(records)s::int[])[1 + i %% cardinality(%(records)s::int[])]
+        """, **params))
+    cr.execute(SQL(
+        """
+        INSERT INTO hms_lab_request (name, case_id, date_requested, requested_by_id, urgency, state)
+        SELECT 'BENCH/' || c.id, c.id, c.admission_date, %(uid)s, 'normal',
+               (ARRAY['draft', 'requested', 'in_progress', 'completed', 'cancelled'])[1 + c.id %% 5]
+          FROM hms_case c WHERE c.name LIKE 'BENCH/%%'
+        """, **params))
+    cr.execute(SQL(
+        """
+        INSERT INTO hms_prescription (name, case_id, date, state)
+        SELECT 'BENCH/' || c.id, c.id, c.admission_date::date,
+               (ARRAY['draft', 'confirmed', 'dispensed', 'cancelled'])[1 + c.id %% 4]
+          FROM hms_case c WHERE c.name LIKE 'BENCH/%%'
+        """, **params))
+    cr.execute(SQL(
+        """
+        INSERT INTO hms_note (name, case_id, note_type, create_date)
+        SELECT 'BENCH', c.id, (ARRAY['general', 'consultation', 'vitals'])[1 + c.id %% 3], c.admission_date
+          FROM hms_case c WHERE c.name LIKE 'BENCH/%%'
+        """, **params))
+    cr.execute(SQL("ANALYZE hms_appointment, hms_case, hms_lab_request, hms_prescription, hms_lab_result, hms_note"))
+    return doctors[0], patients[0]
+
+
+def queries(doctor_id, patient_id):
+    return {
+        'dashboard: doctor agenda': SQL(
+            "SELECT id FROM hms_appointment WHERE doctor_id = %s AND state = 'confirmed'"
+            " AND date >= timestamp '2000-01-01' AND date < timestamp '2000-01-02' ORDER BY date",
+            doctor_id),
+        'dashboard: active cases': SQL(
+            "SELECT id FROM hms_case WHERE main_doctor_id = %s AND state = 'active'"
+            " ORDER BY admission_date DESC LIMIT 10", doctor_id),
+        'dashboard: open cases': SQL(
+            "SELECT id FROM hms_case WHERE state = 'active' ORDER BY admission_date DESC LIMIT 10"),
+        'dashboard: lab requests today': SQL(
+            "SELECT count(*) FROM hms_lab_request WHERE state = 'draft'"
+            " AND date_requested >= timestamp '2000-01-01' AND date_requested < timestamp '2000-01-02'"),
+        'dashboard: to dispense': SQL(
+            "SELECT id FROM hms_prescription WHERE state = 'confirmed' ORDER BY date DESC LIMIT 80"),
+        'portal: my lab results': SQL(
+            "SELECT id FROM hms_lab_result WHERE patient_id = %s", patient_id),
+        'case: notes by type': SQL(
+            "SELECT id FROM hms_note WHERE case_id = (SELECT max(id) FROM hms_case) AND note_type = 'consultation'"),
+        'constraint: case overlap': SQL(
+            "SELECT id FROM hms_case WHERE main_doctor_id = %s AND state != 'closed'"
+            " AND admission_date BETWEEN timestamp '2000-01-01' AND timestamp '2000-01-01 00:30'", doctor_id),
+    }
+
+
+def measure(label, query):
+    cr.execute(SQL("EXPLAIN (ANALYZE, BUFFERS) %s", query))
+    plan = "\n".join(f"    {line}" for line, in cr.fetchall())
+    started = time.perf_counter()
+    for _i in range(RUNS):
+        cr.execute(query)
+    elapsed = (time.perf_counter() - started) / RUNS * 1000
+    print(f"{label:<34} {elapsed:9.2f} ms\n{plan}")
+
+
+with cr.savepoint(flush=False) as dataset:
+    env.flush_all()  # noqa: F821
+    bench_queries = queries(*generate())
+
+    print("=== with indexes ===")
+    for label, query in bench_queries.items():
+        measure(label, query)
+
+    with cr.savepoint(flush=False) as without_indexes:
+        for index in INDEXES:
+            cr.execute(SQL("DROP INDEX IF EXISTS %s", SQL.identifier(index)))
+        print("=== without indexes ===")
+        for label, query in bench_queries.items():
+            measure(label, query)
+        without_indexes.rollback()
+
+    dataset.rollback()
+cr.rollback()
@@ -34,6 +34,7 @@
         'data/mail_templates.xml',
         'data/sequence.xml',
         'views/hms_prescription_views.xml',
+        'views/hms_pharmacy_queue_views.xml',
         'views/hms_lab_request_views.xml',
         'views/hms_lab_result_views.xml',
         'report/lab_result_template.xml',
@@ -59,6 +60,7 @@
         'data/hr_jobs.xml',
         'data/hms_role_data.xml',
         'data/cron_appointment.xml',
+        'data/ir_cron_data.xml',
         'views/hms_bed_views.xml',
         'views/hms_patient_website.xml',
         'views/hms_consumable_line_views.xml',
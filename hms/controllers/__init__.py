@@ -1,3 +1,6 @@
 from . import portal
 from . import main 
+from . import bed_board
+from . import prescription
+from . import lab_worklist
 
@@ -0,0 +1,10 @@
+from odoo import http
+from odoo.http import request
+
+
+class HmsBedBoardController(http.Controller):
+
+    @http.route('/hms/bed_board', type='jsonrpc', auth='user')
+    def bed_board(self, department_ids=None):
+        """Occupancy snapshot of the beds; follow-up changes arrive on the bus."""
+        return request.env['hms.bed'].get_bed_board(department_ids)
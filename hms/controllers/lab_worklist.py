@@ -0,0 +1,17 @@
+from odoo import http
+from odoo.http import request
+
+
+class HmsLabWorklistController(http.Controller):
+
+    @http.route('/hms/lab/worklist', type='jsonrpc', auth='user')
+    def worklist(self, limit=500):
+        return request.env['hms.lab.worklist'].get_worklist(limit=int(limit))
+
+    @http.route('/hms/lab/worklist/submit', type='jsonrpc', auth='user')
+    def submit(self, results=None, csv=None, raise_on_error=True):
+        """Submit lab results as a list of dicts (``results``) or as CSV text (``csv``)."""
+        Worklist = request.env['hms.lab.worklist']
+        if csv:
+            return Worklist.submit_csv(csv, raise_on_error=raise_on_error)
+        return Worklist.submit_results(results or [], raise_on_error=raise_on_error)
@@ -136,9 +136,12 @@ class PortalPatientController(http.Controller):
             'expected_end' : end1,
             'state': 'draft',
         })
-        rece = request.env['hr.employee'].sudo().search([('hms_role_id.code', '=', 'receptionist')])
-        for rec in rece:
-            appointment.sudo().send_inbox_notification(rec.user_id, _("New appointment request from %s") % partner.name, fields.Datetime.now() + timedelta(days=1))
+        request.env['hms.notification'].sudo()._send([{
+            'record': appointment,
+            'roles': ['receptionist'],
+            'message': _("New appointment request from %s") % partner.name,
+            'date_deadline': fields.Datetime.now() + timedelta(days=1),
+        }])
 
         return request.render('hms.portal_appointment_request_confirmation', {
             'appointment_request': appointment,
@@ -153,28 +156,10 @@ class PortalPatientController(http.Controller):
         doctor_id = int(post.get('doctor_id'))
         doctor = request.env['hr.employee'].sudo().browse(doctor_id)
 
-        # Dummy slot: tomorrow at 9:00
-        calendar = doctor.resource_calendar_id
-        today = fields.Datetime.now()
-        appointments = request.env['hms.appointment'].search([('doctor_id', '=', doctor.id), ('state', '!=', 'canceled')])
-        next_date = None
-        for day_offset in range(0, 30):
-                date_candidate = today + timedelta(days=day_offset)
-                weekday = str(date_candidate.weekday())
-                working_intervals = calendar.attendance_ids.filtered(lambda a: a.dayofweek == weekday)
-                for interval in working_intervals:
-                    start_hour = int(interval.hour_from)
-                    end_hour = int(interval.hour_to)
-                    slot_time = date_candidate.replace(hour=start_hour, minute=0, second=0, microsecond=0)
-                    while slot_time.hour < end_hour:
-                        if not appointments.filtered(lambda a: a.date == slot_time):
-                            next_date = slot_time
-                            break
-                        slot_time += timedelta(minutes=30)
-                    if next_date:
-                        break
-                if next_date:
-                    break
+        slots = request.env['hms.appointment'].sudo()._find_free_slots(doctor)
+        if not slots:
+            return request.redirect('/my/appointment/request')
+        next_date = slots[0]
         end = next_date + timedelta(minutes=30)
 
         appointment = request.env['hms.appointment'].sudo().create({
@@ -185,9 +170,12 @@ class PortalPatientController(http.Controller):
             'expected_end' : end,
             'state': 'draft',
         })
-        rece = request.env['hr.employee'].sudo().search([('hms_role_id.code', '=', 'receptionist')])
-        for rec in rece:
-            appointment.send_inbox_notification(rec.user_id, _("New appointment request from %s") % partner.name, fields.Datetime.now() + timedelta(days=1))
+        request.env['hms.notification'].sudo()._send([{
+            'record': appointment,
+            'roles': ['receptionist'],
+            'message': _("New appointment request from %s") % partner.name,
+            'date_deadline': fields.Datetime.now() + timedelta(days=1),
+        }])
 
         return request.render('hms.portal_appointment_request_confirmation', {
             'appointment_request': appointment,
@@ -215,25 +203,13 @@ class PortalPatientController(http.Controller):
             'urgency': post.get('urgency'),
             'state': 'draft',
         })
-        rece = self.env['hr.employee'].sudo().search([('hms_role_id.code', '=', 'receptionist')])
-        for rec in rece:
-            appointment.send_inbox_notification(rec.user_id, _("New appointment request from %s") % partner.name, fields.Datetime.now() + timedelta(days=1))
+        request.env['hms.notification'].sudo()._send([{
+            'record': appointment,
+            'roles': ['receptionist'],
+            'message': _("New appointment request from %s") % partner.name,
+            'date_deadline': fields.Datetime.now() + timedelta(days=1),
+        }])
 
         return request.render('hms.portal_appointment_request_confirmation', {
             'appointment_request': appointment,
         })
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                summary=_("Hospital Notification"),
-                note=message_body,
-                user_id=user_id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
@@ -0,0 +1,11 @@
+from odoo import http
+from odoo.http import request
+
+
+class HmsPrescriptionController(http.Controller):
+
+    @http.route('/hms/prescription/safety_check', type='jsonrpc', auth='user')
+    def safety_check(self, prescription_ids):
+        """Safety report of all the lines of the prescriptions, see ``hms.prescription.get_safety_report``."""
+        prescriptions = request.env['hms.prescription'].browse([int(pid) for pid in prescription_ids]).exists()
+        return prescriptions.get_safety_report()
@@ -1,4 +1,11 @@
 
+from . import hms_dashboard_cache
+from . import hms_stats_daily
+from . import hms_notification
+from . import hms_cost_ledger
+from . import hms_billing
+from . import hms_drug_safety
+from . import hms_dispensing
 from . import hms_room
 from . import bed
 from . import hms_disease
@@ -7,6 +14,8 @@ from . import consumable_line
 from . import hms_insurance
 from . import hms_role
 from . import res_partner
+from . import res_groups
+from . import res_users
 from . import hr_employee
 from . import hms_case
 from . import hms_medicalrecord
@@ -14,11 +23,14 @@ from . import hms_dashboards
 from . import hms_appointment
 from . import hms_prescription
 from . import hms_prescription_line
+from . import hms_pharmacy_queue
 from . import hms_lab_request
 from . import hms_lab_request_line
 from . import hms_lab_result
+from . import hms_lab_worklist
 from . import product_template
 from . import wizards
 from . import hms_notes
 from . import stock_location
+from . import mail_mail
 from . import hms_vitals
\ No newline at end of file
@@ -1,9 +1,19 @@
 from datetime import timedelta
 from odoo import models, fields, _, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from .hms_counter import reserve_numbers
+
+# Bus notification carrying bed state changes to the open bed boards.
+BED_BOARD_NOTIFICATION = "hms.bed_board/update"
+BED_BOARD_GROUPS = ("hms.group_hms_receptionist", "base.group_system")
 
 class HmsBed(models.Model):
     _name = "hms.bed"
     _description = _("Hospital Bed")
+    _inherit = ["mail.thread", "mail.activity.mixin", "hms.notification.mixin", "hms.dashboard.cache.mixin"]
+    _dashboard_cache_fields = ("state", "room_id")
     _order = "name"
     _rec_name = "name"  # خلّي Odoo يستخدم اسم العرض الافتراضي
 
@@ -25,53 +35,198 @@ class HmsBed(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        for record in records:
-            if record.department_id:
-                total_beds = self.search_count([("room_id", "=", record.room_id.id),])
-                record.name = f"{record.room_id.name} - bed {total_beds}" or _("New bed")
+        beds_by_room = records.filtered("department_id").grouped("room_id")
+        first_numbers = reserve_numbers(self.env, "hms.room", "bed_sequence", {
+            room.id: len(beds) for room, beds in beds_by_room.items()
+        })
+        for room, beds in beds_by_room.items():
+            for number, bed in enumerate(beds, start=first_numbers[room.id]):
+                bed.name = f"{room.name} - bed {number}"
         return records
 
+    def write(self, vals):
+        if "state" not in vals:
+            return super().write(vals)
+        before = {bed.id: bed.state for bed in self}
+        res = super().write(vals)
+        self.filtered(lambda bed: bed.state != before[bed.id])._notify_bed_board()
+        return res
 
+    def _dashboard_cache_targets(self):
+        return {'dashboard': ((), ('reception', 'admin'))}
+
+    # ----------------------------
+    # ALLOCATION
+    # ----------------------------
+
+    def _lock(self):
+        """Lock the rows of the beds until the end of the transaction and reload their state."""
+        if not self:
+            return self
+        self.flush_recordset(["state"])
+        self.env.cr.execute(SQL(
+            "SELECT id FROM hms_bed WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+            self.ids,
+        ))
+        self.invalidate_recordset(["state"])
+        return self
+
+    def _occupy(self):
+        """Mark the beds occupied, raise if one of them was taken meanwhile."""
+        self._lock()
+        taken = self.filtered(lambda bed: bed.state != "available")
+        if taken:
+            raise UserError(_("Selected bed is not available: %s") % ", ".join(taken.mapped("name")))
+        self.write({"state": "occupied"})
+
+    @api.model
+    def _allocate(self, department=None, room=None, count=1):
+        """Pick up to ``count`` available beds and lock them.
+
+        Beds of ``room`` come first, then the beds of the fullest rooms, so
+        that wards are filled one room after the other. Beds locked by a
+        concurrent allocation are skipped instead of waited for; the caller
+        occupies the returned beds, e.g. by assigning them to cases.
+
+        :param department: restrict the beds to this hr.department
+        :param room: preferred hms.room
+        :return: the locked beds, possibly fewer than ``count``
+        """
+        self.env.flush_all()
+        conditions = [SQL("b.state = 'available'"), SQL("NOT COALESCE(r.out_of_service, FALSE)")]
+        if department:
+            conditions.append(SQL("r.department_id = %s", department.id))
+        self.env.cr.execute(SQL(
+            """
+            SELECT b.id
+              FROM hms_bed b
+              JOIN hms_room r ON r.id = b.room_id
+             WHERE %(conditions)s
+             ORDER BY r.id = %(room_id)s DESC, r.beds_occupied DESC, r.id, b.id
+             LIMIT %(count)s
+               FOR UPDATE OF b SKIP LOCKED
+            """,
+            conditions=SQL(" AND ").join(conditions),
+            room_id=room.id if room else 0,
+            count=count,
+        ))
+        return self.browse(bed_id for bed_id, in self.env.cr.fetchall())
+
+    @api.model
+    def get_free_beds_by_department(self):
+        """Return the available beds per hospital department, fullest ward last.
+
+        Read from the counters kept on the departments, so it costs a single
+        query whatever the number of beds.
+        """
+        departments = self.env["hr.department"].sudo().search_read(
+            [("hms_beds_total", ">", 0)],
+            ["name", "hms_beds_total", "hms_beds_available"],
+            order="hms_beds_available desc, name",
+        )
+        return [{
+            "id": department["id"],
+            "name": department["name"],
+            "total": department["hms_beds_total"],
+            "free": department["hms_beds_available"],
+        } for department in departments]
+
+    # ----------------------------
+    # BED BOARD
+    # ----------------------------
+
+    @api.model
+    def get_bed_board(self, department_ids=None):
+        """Snapshot of every bed, grouped by department and room, in one query.
+
+        Beds are ``[id, name, state]`` triplets to keep the payload small;
+        later changes are pushed on the bus as ``BED_BOARD_NOTIFICATION``.
+
+        :param department_ids: optional hr.department ids to restrict the board to
+        """
+        self.check_access("read")
+        self.env.flush_all()
+        where = SQL("TRUE")
+        if department_ids:
+            where = SQL("r.department_id = ANY(%s)", [int(department_id) for department_id in department_ids])
+        self.env.cr.execute(SQL(
+            """
+            SELECT d.id, COALESCE(d.name->>%(lang)s, d.name->>'en_US'),
+                   r.id, r.name, COALESCE(r.out_of_service, FALSE),
+                   json_agg(json_build_array(b.id, b.name, b.state) ORDER BY b.name, b.id)
+              FROM hms_bed b
+              JOIN hms_room r ON r.id = b.room_id
+              LEFT JOIN hr_department d ON d.id = r.department_id
+             WHERE %(where)s
+             GROUP BY d.id, r.id
+             ORDER BY 2, r.name, r.id
+            """,
+            lang=self.env.lang or "en_US",
+            where=where,
+        ))
+        departments = {}
+        for department_id, department_name, room_id, room_name, out_of_service, beds in self.env.cr.fetchall():
+            department = departments.setdefault(department_id, {
+                "id": department_id or False,
+                "name": department_name or "",
+                "free": 0,
+                "total": 0,
+                "rooms": [],
+            })
+            department["rooms"].append({
+                "id": room_id,
+                "name": room_name,
+                "out_of_service": out_of_service,
+                "beds": beds,
+            })
+            department["total"] += len(beds)
+            if not out_of_service:
+                department["free"] += sum(1 for _id, _name, state in beds if state == "available")
+        return {
+            "notification": BED_BOARD_NOTIFICATION,
+            "departments": list(departments.values()),
+        }
+
+    def _notify_bed_board(self):
+        """Push the new state of the beds and the counters of their departments to the bed boards."""
+        if not self:
+            return
+        self.env.flush_all()
+        departments = self.department_id.sudo()
+        payload = {
+            "beds": [[bed.id, bed.room_id.id, bed.department_id.id, bed.state] for bed in self],
+            "departments": [{
+                "id": department.id,
+                "free": department.hms_beds_available,
+                "total": department.hms_beds_total,
+            } for department in departments],
+        }
+        Bus = self.env["bus.bus"].sudo()
+        for group_xmlid in BED_BOARD_GROUPS:
+            group = self.env.ref(group_xmlid, raise_if_not_found=False)
+            if group:
+                Bus._sendone(group, BED_BOARD_NOTIFICATION, payload)
 
-    
     def action_oof_bed(self):
         """Action to take when a bed is marked as out of service."""
         for bed in self:
             if bed.state != 'maintenance':
                 bed.state = 'maintenance'
-            rece = self.env['hr.employee'].search([('hms_role_id.name', '=', 'Receptionist')])
-            for rec in rece:
-                if rec.user_id:
-                    bed.send_inbox_notification(
-                    user_id=rec.user_id,
-                    message_body=_("Bed %s is now out of service") % bed.name,
-                    date_deadline=fields.Datetime.now() + timedelta(days=1)
-                )
+        self.env['hms.notification']._send([{
+            'record': bed,
+            'roles': ['receptionist'],
+            'message': _("Bed %s is now out of service") % bed.name,
+            'date_deadline': fields.Datetime.now() + timedelta(days=1),
+        } for bed in self])
     
     def action_restore_bed(self):
         """Action to take when a bed is restored."""
         for bed in self:
             if bed.state == 'maintenance':
                 bed.state = 'available'
-
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                activity_type_xmlid="hms.mail_activity_hms_notice",
-                summary=_("Hospital Notification"),
-                note=f"<div>{message_body}",
-                user_id=user_id.id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
         
     def _compute_can_edit(self):
+        can_edit = 'edit_facilities' in self.env['hms.role'].get_capabilities()
         for room in self:
-            room.can_edit = self.env.user.has_group('hms.group_hms_receptionist')
+            room.can_edit = can_edit
 
@@ -4,6 +4,9 @@ class HmsConsumableLine(models.Model):
     _name = "hms.consumable.line"
     _description = _("Consumable Line")
     _order = "id desc"
+    _inherit = ["hms.cost.line.mixin"]
+    _cost_category = "consumable"
+    _cost_fields = ("product_id", "quantity", "case_id")
 
     product_id = fields.Many2one(
         "product.product",
@@ -36,4 +39,7 @@ class HmsConsumableLine(models.Model):
     def _onchange_product_id(self):
         for rec in self:
             if rec.product_id:
-                rec.unit_price = rec.product_id.lst_price or rec.product_id.list_price or 0.0
\ No newline at end of file
+                rec.unit_price = rec.product_id.lst_price or rec.product_id.list_price or 0.0
+
+    def _cost_amount(self):
+        return self.product_id.list_price * self.quantity
@@ -1,12 +1,79 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import timedelta, datetime
+import logging
+import time
+
+import psycopg2
+
+from odoo.tools import SQL
+from odoo.tools.sql import add_constraint, constraint_definition, drop_constraint
+
+_logger = logging.getLogger(__name__)
+
+SLOT_DURATION = timedelta(minutes=30)
+NO_SHOW_BATCH_SIZE = 500
+# Appointments in these states do not keep their slot booked.
+FREE_STATES = ('canceled', 'no_show')
+# Booked interval of an appointment, [date, expected_end), 30 minutes by default.
+BOOKED_RANGE = (
+    "tsrange({0}date, CASE WHEN {0}expected_end > {0}date THEN {0}expected_end "
+    "ELSE {0}date + interval '30 minutes' END, '[)')"
+)
+
+
+def ensure_btree_gist(cr):
+    """Install btree_gist, needed to mix scalar and range columns in an exclusion constraint.
+
+    :return: whether the extension is available
+    """
+    try:
+        with cr.savepoint():
+            cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    except psycopg2.Error:
+        _logger.warning("Could not install the btree_gist extension, doctor overlaps are only checked in Python")
+        return False
+    return True
+
+
+def ensure_overlap_constraint(cr, table, conname, definition, overlaps):
+    """Create or update the exclusion constraint ``conname`` of ``table``.
+
+    The constraint is left out when btree_gist is missing, or when existing
+    rows already violate it: they are reported in the log instead of failing
+    the module update, and the constraint is added by the next update once
+    they are fixed.
+
+    :param overlaps: SQL returning the ``(id, other_id)`` pairs of conflicting rows
+    """
+    current = constraint_definition(cr, table, conname)
+    if current == definition or not ensure_btree_gist(cr):
+        return
+    if current:
+        drop_constraint(cr, table, conname)
+    cr.execute(overlaps)
+    ids = sorted({row_id for row_id, _other_id in cr.fetchall()})
+    if ids:
+        _logger.warning(
+            "Table %s: constraint %s not added, %d rows overlap another one, ids: %s",
+            table, conname, len(ids), ids[:100],
+        )
+        return
+    add_constraint(cr, table, conname, definition)
+
 
 class HmsAppointment(models.Model):
     _name = 'hms.appointment'
     _description = _('Patient Appointment')
-    _inherit = ['mail.activity.mixin']
+    _inherit = ['mail.activity.mixin', 'hms.dashboard.cache.mixin', 'hms.stats.mixin', 'hms.notification.mixin']
+    _stats_fields = ('date', 'state', 'doctor_id', 'department_id')
+    _dashboard_cache_fields = ('state', 'date', 'doctor_id', 'case_id', 'patient_id')
+
+    # agenda of a doctor: dashboard, free slot search and overlap checks
+    _doctor_date_state_idx = models.Index("(doctor_id, date, state)")
 
     name = fields.Char(string="Appointment Reference", required=True, copy=False, readonly=True, tracking=True)
     case_id = fields.Many2one('hms.case', string='Case', tracking=True)
@@ -40,20 +107,34 @@ class HmsAppointment(models.Model):
     reason = fields.Text(string='Reason for Appointment')
     user_id = fields.Many2one('res.users', string='User', default=lambda self: self.env.user)
 
+    def _dashboard_cache_targets(self):
+        staff = self.doctor_id | self.case_id.nurse_id
+        return {
+            'dashboard': (staff.user_id.ids, ('reception', 'admin')),
+            'chart': ((), ('doctor', 'nurse', 'reception', 'admin')),
+        }
+
     # ----------------------------
     # Core Workflow Methods
     # ----------------------------
 
     def action_confirm(self):
         """Keep appointments as bookings only. Confirm appointment and create calendar event."""
+        notices = []
         for appt in self:
             appt.state = 'confirmed'
             appt._create_or_update_calendar_event()
-            template = self.env.ref('hms.email_template_appointment_confirmation')
-            template.send_mail(self.id, force_send=True)
             # notify the doctor via activity
             if appt.doctor_id and appt.doctor_id.user_id:
-                appt.send_inbox_notification(appt.doctor_id.user_id, _("You have an appointment with %s at %s") % (appt.patient_id.name, appt.date), appt.date - timedelta(hours=1))
+                notices.append({
+                    'record': appt,
+                    'user_ids': appt.doctor_id.user_id.ids,
+                    'message': _("You have an appointment with %s at %s") % (appt.patient_id.name, appt.date),
+                    'date_deadline': appt.date - timedelta(hours=1),
+                })
+        self.env['hms.notification']._send(notices)
+        # Rendered now, delivered by the mail queue cron outside of the request
+        self.env.ref('hms.email_template_appointment_confirmation').send_mail_batch(self.ids)
 
     def action_in_progress(self):
         """
@@ -109,24 +190,46 @@ class HmsAppointment(models.Model):
             appointment.state = 'done'
 
     def action_cancel(self, reason=None):
+        notices = []
         for appointment in self:
             appointment.state = 'canceled'
             appointment.cancel_reason = reason or _('Canceled by user.')
-            template = self.sudo().env.ref('hms.email_template_appointment_cancellation')
-            template.send_mail(self.id, force_send=True)
             if appointment.doctor_id and appointment.doctor_id.user_id:
-                appointment.send_inbox_notification(appointment.sudo().doctor_id.user_id, _("Appointment with %s at %s was canceled") % (appointment.patient_id.name, appointment.date), appointment.date)
+                notices.append({
+                    'record': appointment,
+                    'user_ids': appointment.sudo().doctor_id.user_id.ids,
+                    'message': _("Appointment with %s at %s was canceled") % (appointment.patient_id.name, appointment.date),
+                    'date_deadline': appointment.date,
+                })
+        self.env['hms.notification']._send(notices)
+        self.sudo().env.ref('hms.email_template_appointment_cancellation').send_mail_batch(self.ids)
 
     @api.model
-    def _auto_mark_no_show(self):
-        now = fields.Datetime.now()
-        appointments = self.search([
-            ('state', '=', 'confirmed'),
-            ('expected_end', '<', now)
-        ])
-        for appointment in appointments:
-            appointment.state = 'no_show'
-            appointment.no_show_reason = _('Patient did not attend the appointment (auto-detected).')
+    def _auto_mark_no_show(self, batch_size=NO_SHOW_BATCH_SIZE):
+        """Mark confirmed appointments that ended without the patient as no-show.
+
+        Appointments are written ``batch_size`` at a time and every batch is
+        committed through the cron progress API, so a backlog after downtime
+        never holds one long transaction on the appointment table.
+        """
+        started = time.monotonic()
+        domain = [('state', '=', 'confirmed'), ('expected_end', '<', fields.Datetime.now())]
+        remaining = self.search_count(domain)
+        processed = 0
+        while remaining:
+            appointments = self.search(domain, limit=batch_size, order='id')
+            if not appointments:
+                break
+            appointments.write({
+                'state': 'no_show',
+                'no_show_reason': _('Patient did not attend the appointment (auto-detected).'),
+            })
+            processed += len(appointments)
+            remaining = max(remaining - len(appointments), 0)
+            if not self.env['ir.cron']._commit_progress(len(appointments), remaining=remaining):
+                break
+        _logger.info("Marked %s appointments as no-show in %.2fs, %s left",
+                     processed, time.monotonic() - started, remaining)
 
     # ----------------------------
     # Doctor Availability - helpers
@@ -152,43 +255,120 @@ class HmsAppointment(models.Model):
         for rec in self:
             if not rec.doctor_id:
                 continue
-            calendar = rec.doctor_id.resource_calendar_id
-            if not calendar:
-                continue
-            today = fields.Datetime.now()
-            appointments = self.env['hms.appointment'].search([('doctor_id', '=', rec.doctor_id.id), ('state', '!=', 'canceled')])
-            next_date = None
-            for day_offset in range(0, 30):
-                date_candidate = today + timedelta(days=day_offset)
-                weekday = str(date_candidate.weekday())
-                working_intervals = calendar.attendance_ids.filtered(lambda a: a.dayofweek == weekday)
-                for interval in working_intervals:
-                    start_hour = int(interval.hour_from)
-                    end_hour = int(interval.hour_to)
-                    slot_time = date_candidate.replace(hour=start_hour, minute=0, second=0, microsecond=0)
-                    while slot_time.hour < end_hour:
-                        if not appointments.filtered(lambda a: a.date == slot_time):
-                            next_date = slot_time
-                            break
-                        slot_time += timedelta(minutes=30)
-                    if next_date:
-                        break
-                if next_date:
-                    break
-            if next_date:
-                rec.date = next_date
+            slots = self._find_free_slots(rec.doctor_id)
+            if slots:
+                rec.date = slots[0]
+
+    # ----------------------------
+    # Slot finder
+    # ----------------------------
+    @api.model
+    def _find_free_slots(self, doctor, count=1, start=None, days=30, duration=SLOT_DURATION):
+        """Return up to ``count`` free slot start times for ``doctor``.
+
+        Slots follow the doctor's working calendar, start on the hour of each
+        attendance and last ``duration``. Only the appointments of the
+        searched window are loaded; each probe is a binary search in the
+        merged busy intervals.
+        """
+        calendar = doctor.resource_calendar_id
+        if not calendar:
+            return []
+        start = start or fields.Datetime.now()
+        first_day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        busy = self._get_busy_intervals(doctor, first_day, first_day + timedelta(days=days))
+        busy_starts = [interval[0] for interval in busy]
+
+        working_hours = defaultdict(list)
+        for attendance in calendar.attendance_ids:
+            if attendance.day_period != 'lunch':
+                working_hours[int(attendance.dayofweek)].append((attendance.hour_from, attendance.hour_to))
+
+        slots = []
+        for day_offset in range(days):
+            day = first_day + timedelta(days=day_offset)
+            for hour_from, hour_to in sorted(working_hours.get(day.weekday(), ())):
+                slot = day + timedelta(hours=int(hour_from))
+                day_end = day + timedelta(hours=hour_to)
+                while slot + duration <= day_end:
+                    if slot >= start and not self._is_busy(busy, busy_starts, slot, slot + duration):
+                        slots.append(slot)
+                        if len(slots) >= count:
+                            return slots
+                    slot += duration
+        return slots
+
+    @api.model
+    def _get_busy_intervals(self, doctor, start, end):
+        """Sorted, merged ``[start, end)`` intervals booked for ``doctor`` between ``start`` and ``end``."""
+        appointments = self.sudo().search_read([
+            ('doctor_id', '=', doctor.id),
+            ('state', 'not in', FREE_STATES),
+            ('date', '>=', start - timedelta(days=1)),
+            ('date', '<', end),
+        ], ['date', 'expected_end'], order='date')
+        busy = []
+        for appointment in appointments:
+            appt_start = appointment['date']
+            appt_end = appointment['expected_end']
+            if not appt_end or appt_end <= appt_start:
+                appt_end = appt_start + SLOT_DURATION
+            if busy and appt_start <= busy[-1][1]:
+                busy[-1][1] = max(busy[-1][1], appt_end)
+            else:
+                busy.append([appt_start, appt_end])
+        return busy
+
+    @staticmethod
+    def _is_busy(busy, busy_starts, start, end):
+        index = bisect_right(busy_starts, start) - 1
+        if index >= 0 and busy[index][1] > start:
+            return True
+        return index + 1 < len(busy) and busy[index + 1][0] < end
 
     @api.onchange('date')
     def _onchange_date_update_available_doctors(self):
         for rec in self:
             if not rec.date:
                 continue
-            all_doctors = self.env['hr.employee'].search([('hms_role_id.code', '=', 'doctor')])
+            all_doctors = self.env['hms.role'].get_employees('doctor')
             busy_doctors = self.env['hms.appointment'].search([('date', '=', rec.date), ('state', '!=', 'canceled')]).mapped('doctor_id')
             available_doctors = all_doctors - busy_doctors
             rec.expected_end = rec.date + timedelta(minutes= 30)
             return {'domain': {'doctor_id': [('id', 'in', available_doctors.ids)]}}
 
+    def init(self):
+        # Overlapping bookings of a doctor are rejected by the database itself,
+        # so concurrent portal bookings cannot both pass the Python check. The
+        # constraint is deferred to the commit: within a transaction the flush
+        # goes through and _check_doctor_overlap reports the conflict first.
+        ensure_overlap_constraint(
+            self.env.cr, self._table, 'hms_appointment_doctor_no_overlap',
+            "EXCLUDE USING gist (doctor_id WITH =, %s WITH &&) WHERE (state NOT IN ('canceled', 'no_show')) "
+            "DEFERRABLE INITIALLY DEFERRED" % BOOKED_RANGE.format(''),
+            self._doctor_overlap_query(),
+        )
+
+    def _doctor_overlap_query(self, ids=None):
+        """Return the SQL selecting ``(id, other_id)`` for the booked appointments
+        overlapping another one of the same doctor, among ``ids`` or all of them."""
+        return SQL(
+            """
+            SELECT a.id, other.id
+              FROM hms_appointment a
+              JOIN hms_appointment other
+                ON other.doctor_id = a.doctor_id
+               AND other.id != a.id
+               AND other.state NOT IN %(free_states)s
+               AND %(other_range)s && %(range)s
+             WHERE a.state NOT IN %(free_states)s %(restrict)s
+            """,
+            free_states=FREE_STATES,
+            other_range=SQL(BOOKED_RANGE.format('other.')),
+            range=SQL(BOOKED_RANGE.format('a.')),
+            restrict=SQL("AND a.id = ANY(%s)", ids) if ids is not None else SQL(),
+        )
+
     @api.constrains('doctor_id', 'date')
     def _check_doctor_availability(self):
         for rec in self:
@@ -199,13 +379,21 @@ class HmsAppointment(models.Model):
                     attendances = calendar.attendance_ids.filtered(lambda a: a.dayofweek == str(weekday))
                     if not any(a.hour_from*3600 <= rec.date.hour*3600 + rec.date.minute*60 <= a.hour_to*3600 for a in attendances):
                         raise ValidationError(_("Doctor %s is not working at the selected time.") % rec.doctor_id.name)
-                start_time = rec.date
-                end_time = rec.date + timedelta(minutes=30)
-                overlapping = self.search([('id', '!=', rec.id), ('doctor_id', '=', rec.doctor_id.id),
-                                          ('date', '>=', start_time), ('date', '<=', end_time), ('state', '!=', 'canceled')], limit=1)
-                if overlapping:
-                    raise ValidationError(_("Doctor %s is already booked between %s and %s.") %
-                                          (rec.doctor_id.name, start_time, end_time))
+
+    @api.constrains('doctor_id', 'date', 'expected_end', 'state')
+    def _check_doctor_overlap(self):
+        """Reject appointments whose booked interval overlaps another one of the same doctor.
+
+        The whole batch is checked with one query on the GiST index of the
+        exclusion constraint.
+        """
+        self.flush_model(['doctor_id', 'date', 'expected_end', 'state'])
+        self.env.cr.execute(SQL("%s LIMIT 1", self._doctor_overlap_query(self.ids)))
+        row = self.env.cr.fetchone()
+        if row:
+            rec = self.browse(row[0])
+            raise ValidationError(_("Doctor %s is already booked between %s and %s.") %
+                                  (rec.doctor_id.name, rec.date, rec.expected_end or rec.date + SLOT_DURATION))
 
     # ----------------------------
     # Calendar Integration
@@ -269,19 +457,3 @@ class HmsAppointment(models.Model):
         if 'date' in vals or 'doctor_id' in vals:
             self._create_or_update_calendar_event()
         return res
-
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                summary=_("Hospital Notification"),
-                note=f"{message_body}",
-                user_id=user_id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
\ No newline at end of file
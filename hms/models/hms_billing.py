@@ -0,0 +1,36 @@
+from odoo import models, api
+
+
+class HmsBilling(models.AbstractModel):
+    """Push the billable lines of hospital documents to the case sale orders.
+
+    Lines are collected for a whole set of documents and created in one go,
+    so prices, taxes and procurements are computed once per batch instead of
+    once per line.
+    """
+    _name = 'hms.billing'
+    _description = 'HMS Billing Synchronisation'
+
+    @api.model
+    def _prepare_line(self, order, product, quantity=1, price_unit=None):
+        return {
+            'order_id': order.id,
+            'product_id': product.id,
+            'product_uom_qty': quantity,
+            'price_unit': product.list_price if price_unit is None else price_unit,
+        }
+
+    @api.model
+    def _add_order_lines(self, vals_list):
+        """Create the sale order lines of ``vals_list`` with a single create."""
+        vals_list = [vals for vals in vals_list if vals.get('order_id')]
+        if not vals_list:
+            return self.env['sale.order.line']
+        return self.env['sale.order.line'].create(vals_list)
+
+    @api.model
+    def _validate_pickings(self, orders):
+        """Validate the open pickings of all ``orders`` with one call."""
+        pickings = orders.picking_ids.filtered(lambda p: p.state not in ('done', 'cancel'))
+        if pickings:
+            pickings.button_validate()
@@ -1,13 +1,35 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from collections import defaultdict
 from datetime import timedelta
-from odoo.tools import html2plaintext
+import logging
+from odoo.tools import html2plaintext, SQL
+from odoo.tools.sql import table_exists
+
+from .hms_appointment import ensure_overlap_constraint
+from .hms_cost_ledger import COST_CATEGORIES
+from .hms_counter import reserve_numbers
+from .hms_dashboard_cache import ALL_ROLES
+
+_logger = logging.getLogger(__name__)
+
+COST_LINE_TABLES = ('hms_prescription_line', 'hms_lab_request_line', 'hms_consumable_line')
+
+# Admissions of a doctor must be at least 30 minutes apart. Cases without an
+# admission date are left out, their range would be unbounded.
+ADMISSION_RANGE = "tsrange({0}admission_date, {0}admission_date + interval '30 minutes', '[]')"
 
 
 class HmsCase(models.Model):
     _name = 'hms.case'
     _description = 'Patient Case'
-    _inherit = ['mail.thread','mail.activity.mixin']
+    _inherit = ['mail.thread','mail.activity.mixin', 'hms.dashboard.cache.mixin', 'hms.stats.mixin', 'hms.notification.mixin']
+    _stats_fields = ('admission_date', 'discharge_date', 'main_doctor_id')
+    _dashboard_cache_fields = ('name', 'state', 'main_doctor_id', 'nurse_id', 'consulting_doctor_ids', 'admission_date')
+
+    _main_doctor_state_admission_idx = models.Index("(main_doctor_id, state, admission_date)")
+    # open cases are a small and hot part of the table
+    _open_admission_idx = models.Index("(admission_date DESC, main_doctor_id) WHERE state != 'closed'")
 
     name = fields.Char(
         string="Case ID", required=True, copy=False, readonly=True,
@@ -33,17 +55,17 @@ class HmsCase(models.Model):
 
     main_doctor_id = fields.Many2one(
         'hr.employee', string='Main Doctor',
-        domain="[('hms_role_id.name', '=', 'Doctor')]", tracking=True, required=True
+        domain="[('hms_role_id.code', '=', 'doctor')]", tracking=True, required=True
     )
     nurse_id = fields.Many2many(
         'hr.employee', string='Nurses',
-        domain="[('hms_role_id.name', '=', 'Nurse')]", tracking=True
+        domain="[('hms_role_id.code', '=', 'nurse')]", tracking=True
     )
     consulting_doctor_ids = fields.Many2many(
         'hr.employee', 'hms_case_doctor_rel',
         'case_ids', 'doctor_id',
         string='Consulting Doctors',
-        domain="[('hms_role_id.name', '=', 'Doctor')]"
+        domain="[('hms_role_id.code', '=', 'doctor')]"
     )
 
     appointment_id = fields.Many2one('hms.appointment', string='Related Appointment')
@@ -77,7 +99,13 @@ class HmsCase(models.Model):
     consumable_line_ids = fields.One2many('hms.consumable.line', 'case_id', string="Consumables")
     room_id = fields.Many2one('hms.room', string='Room')
 
-    total_cost = fields.Float(string='Total Cost', compute='_compute_total_cost', store=True)
+    # Maintained incrementally by the cost lines (hms.cost.line.mixin), reconciled nightly
+    pharmacy_cost = fields.Float(string='Pharmacy Cost', readonly=True, copy=False)
+    lab_cost = fields.Float(string='Lab Cost', readonly=True, copy=False)
+    consumable_cost = fields.Float(string='Consumables Cost', readonly=True, copy=False)
+    total_cost = fields.Float(string='Total Cost', readonly=True, copy=False,
+                              help="Pharmacy, lab and consumables costs. The stay is billed at discharge.")
+    stay_cost = fields.Float(string='Stay Cost', compute='_compute_stay_cost', store=True)
     insurance_covered = fields.Float(string='Insurance Covered', compute='_compute_insurance_covered', store=True)
     patient_share = fields.Float(string='Patient Share', compute='_compute_patient_share', store=True)
     invoice_id = fields.Many2one('account.move', string='Invoice', readonly=True)
@@ -130,6 +158,13 @@ class HmsCase(models.Model):
     # ----------------------------
     # COMPUTES
     # ----------------------------
+    def _dashboard_cache_targets(self):
+        staff = self.main_doctor_id | self.nurse_id | self.consulting_doctor_ids
+        return {
+            'dashboard': (staff.user_id.ids, ('lab', 'chemist', 'reception', 'admin')),
+            'chart': ((), ALL_ROLES),
+        }
+
     def _compute_can_approve_invoice(self):
         for rec in self:
             rec.can_approve_invoice = bool(
@@ -160,38 +195,113 @@ class HmsCase(models.Model):
         for case in self:
             case.patient_share = case.total_cost - case.insurance_covered
 
-    @api.depends(
-        'prescription_ids.prescription_line_ids.quantity',
-        'lab_request_ids.lab_request_line_ids',
-        'consumable_line_ids.quantity'
-    )
-    def _compute_total_cost(self):
+    @api.depends('stay_days')
+    def _compute_stay_cost(self):
+        stay_product = self.env.ref('hms.product_room_stay', raise_if_not_found=False)
         for case in self:
-            prescription_cost = sum(
-                line.product_id.list_price * line.quantity
-                for prescription in case.prescription_ids
-                for line in prescription.prescription_line_ids
-            )
-            lab_cost = sum(
-                line.product_id.list_price
-                for lab in case.lab_request_ids
-                for line in lab.lab_request_line_ids
-            )
-            consumable_cost = sum(
-                line.product_id.list_price * line.quantity
-                for line in case.consumable_line_ids
+            case.stay_cost = case.stay_days * stay_product.list_price if stay_product else 0.0
+
+    # ----------------------------
+    # Cost ledger
+    # ----------------------------
+    @api.model
+    def _apply_cost_deltas(self, deltas):
+        """Add ``{(case_id, category): amount}`` to the cost subtotals and total of the cases."""
+        by_case = defaultdict(lambda: dict.fromkeys(COST_CATEGORIES, 0.0))
+        for (case_id, category), amount in deltas.items():
+            if case_id and amount:
+                by_case[case_id][category] += amount
+        if not by_case:
+            return
+        # Increment in SQL so concurrent line entries on one case never lose an update
+        self.env.cr.execute(SQL(
+            """
+            UPDATE hms_case AS c
+               SET pharmacy_cost = COALESCE(c.pharmacy_cost, 0) + d.pharmacy,
+                   lab_cost = COALESCE(c.lab_cost, 0) + d.lab,
+                   consumable_cost = COALESCE(c.consumable_cost, 0) + d.consumable,
+                   total_cost = COALESCE(c.total_cost, 0) + d.pharmacy + d.lab + d.consumable
+              FROM (SELECT unnest(%(ids)s::int[]) AS id,
+                           unnest(%(pharmacy)s::float8[]) AS pharmacy,
+                           unnest(%(lab)s::float8[]) AS lab,
+                           unnest(%(consumable)s::float8[]) AS consumable) AS d
+             WHERE c.id = d.id
+            """,
+            ids=list(by_case),
+            pharmacy=[amounts['pharmacy'] for amounts in by_case.values()],
+            lab=[amounts['lab'] for amounts in by_case.values()],
+            consumable=[amounts['consumable'] for amounts in by_case.values()],
+        ))
+        self.browse(list(by_case))._cost_modified()
+
+    def _cost_modified(self):
+        fnames = [f'{category}_cost' for category in COST_CATEGORIES] + ['total_cost']
+        self.invalidate_recordset(fnames)
+        self.modified(fnames)
+
+    @api.model
+    def _reconcile_costs(self):
+        """Recompute every cost subtotal from the lines, return the ids of the corrected cases."""
+        self.env.cr.execute(SQL(
+            """
+            WITH costs AS (
+                SELECT c.id,
+                       COALESCE(pharmacy.amount, 0) AS pharmacy,
+                       COALESCE(lab.amount, 0) AS lab,
+                       COALESCE(consumable.amount, 0) AS consumable
+                  FROM hms_case c
+                  LEFT JOIN (SELECT p.case_id, SUM(t.list_price * l.quantity) AS amount
+                               FROM hms_prescription_line l
+                               JOIN hms_prescription p ON p.id = l.prescription_id
+                               JOIN product_product pp ON pp.id = l.product_id
+                               JOIN product_template t ON t.id = pp.product_tmpl_id
+                              GROUP BY p.case_id) AS pharmacy ON pharmacy.case_id = c.id
+                  LEFT JOIN (SELECT r.case_id, SUM(t.list_price) AS amount
+                               FROM hms_lab_request_line l
+                               JOIN hms_lab_request r ON r.id = l.lab_request_id
+                               JOIN product_product pp ON pp.id = l.product_id
+                               JOIN product_template t ON t.id = pp.product_tmpl_id
+                              GROUP BY r.case_id) AS lab ON lab.case_id = c.id
+                  LEFT JOIN (SELECT l.case_id, SUM(t.list_price * l.quantity) AS amount
+                               FROM hms_consumable_line l
+                               JOIN product_product pp ON pp.id = l.product_id
+                               JOIN product_template t ON t.id = pp.product_tmpl_id
+                              GROUP BY l.case_id) AS consumable ON consumable.case_id = c.id
             )
-            case.total_cost = prescription_cost + lab_cost + consumable_cost
-            
+            UPDATE hms_case AS c
+               SET pharmacy_cost = costs.pharmacy,
+                   lab_cost = costs.lab,
+                   consumable_cost = costs.consumable,
+                   total_cost = costs.pharmacy + costs.lab + costs.consumable
+              FROM costs
+             WHERE costs.id = c.id
+               AND (c.pharmacy_cost IS DISTINCT FROM costs.pharmacy
+                    OR c.lab_cost IS DISTINCT FROM costs.lab
+                    OR c.consumable_cost IS DISTINCT FROM costs.consumable
+                    OR c.total_cost IS DISTINCT FROM costs.pharmacy + costs.lab + costs.consumable)
+         RETURNING c.id
+            """
+        ))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _cron_reconcile_costs(self):
+        self.env.flush_all()
+        case_ids = self._reconcile_costs()
+        self.browse(case_ids)._cost_modified()
+        _logger.info("Reconciled the costs of %s cases", len(case_ids))
+
     @api.depends('user_id')
     def _compute_edit_rights(self):
+        Role = self.env['hms.role']
         for rec in self:
-            rec.can_edit_diagnosis = rec.user_id.has_group('hms.group_hms_doctor') or rec.user_id.has_group('base.group_system')
-            rec.can_edit_labs = rec.user_id.has_group('hms.group_hms_doctor') or rec.user_id.has_group('hms.group_hms_lab') or rec.user_id.has_group('hms.group_hms_nurse') or rec.user_id.has_group('base.group_system')
-            rec.can_edit_consumables = rec.user_id.has_group('hms.group_hms_nurse') or rec.user_id.has_group('base.group_system')
-            rec.can_edit_prescriptions = rec.user_id.has_group('hms.group_hms_doctor') or rec.user_id.has_group('hms.group_hms_chemist') or rec.user_id.has_group('base.group_system')
-            rec.can_edit_team = rec.user_id.has_group('hms.group_hms_receptionist') or rec.user_id.has_group('base.group_system')
-            rec.can_edit_logistics = rec.user_id.has_group('hms.group_hms_receptionist') or rec.user_id.has_group('hms.group_hms_doctor') or rec.user_id.has_group('base.group_system')
+            capabilities = Role.get_capabilities(rec.user_id or self.env.user)
+            rec.can_edit_diagnosis = 'edit_diagnosis' in capabilities
+            rec.can_edit_labs = 'edit_labs' in capabilities
+            rec.can_edit_consumables = 'edit_consumables' in capabilities
+            rec.can_edit_prescriptions = 'edit_prescriptions' in capabilities
+            rec.can_edit_team = 'edit_team' in capabilities
+            rec.can_edit_logistics = 'edit_logistics' in capabilities
             
     @api.onchange('main_doctor_id')
     def _onchange_main_doctor_id(self):
@@ -210,7 +320,7 @@ class HmsCase(models.Model):
         for rec in self:
             if not rec.admission_date:
                 continue
-            all_doctors = self.env['hr.employee'].search([('hms_role_id.code', '=', 'doctor')])
+            all_doctors = self.env['hms.role'].get_employees('doctor')
             busy_doctors = self.env['hms.appointment'].search([('date', '=', rec.admission_date), ('state', '!=', 'canceled')]).mapped('doctor_id')
             available_doctors = all_doctors - busy_doctors
             return {'domain': {'doctor_id': [('id', 'in', available_doctors.ids)]}}
@@ -218,60 +328,94 @@ class HmsCase(models.Model):
     # CREATE / WRITE OVERRIDES
     # ----------------------------
 
-    @api.model
-    def create(self, vals):
-        record = super().create(vals)
-        if record.patient_id:
-            case_count = self.search_count([('patient_id', '=', record.patient_id.id)])
-            record.name = f"CR/{record.patient_id.name}_#{case_count}"
-        record.created_by = self.env.user
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._assign_case_names()
+        records.created_by = self.env.user
+        notices = []
         if self.env.context.get("from_appointment_id"):
             appointment = self.env["hms.appointment"].browse(self.env.context["from_appointment_id"])
-            appointment.case_id = record.id
-            appointment.state = 'in_progress'
-            record.appointment_id = appointment.id
-            record.send_inbox_notification(appointment.doctor_id.user_id, _("Your patient scheduled for :%s name: %s has arrived at room: %s case : %s") % (appointment.date, record.patient_id.name, record.room_id.name if record.room_id else 'N/A', record.name), appointment.date + timedelta(hours=1))
-
-
-        elif record.main_doctor_id and record.main_doctor_id.user_id:
-            record.send_inbox_notification(record.sudo().main_doctor_id.user_id, _("You have a new patient: %s at room: %s case : %s") % (record.patient_id.name, record.room_id.name if record.room_id else 'N/A', record.name), record.admission_date + timedelta(hours=1))
-        if not record.sale_order_id:
-            so = self.env['sale.order'].create({
-                'partner_id': record.patient_id.id,   # FIXED
-                'origin': record.name,                # FIXED
-            })
-            record.sale_order_id = so.id 
-            doctor_timesheet_product = self.env.ref("hms.doctor_timesheet_service")
-            nurse_timesheet_product = self.env.ref("hms.nurse_timesheet_service")
-    
-            so_line = self.env['sale.order.line'].create({
+            for record in records:
+                appointment.case_id = record.id
+                appointment.state = 'in_progress'
+                record.appointment_id = appointment.id
+                notices.append({
+                    'record': record,
+                    'user_ids': appointment.doctor_id.user_id.ids,
+                    'message': _("Your patient scheduled for :%s name: %s has arrived at room: %s case : %s") % (appointment.date, record.patient_id.name, record.room_id.name if record.room_id else 'N/A', record.name),
+                    'date_deadline': appointment.date + timedelta(hours=1),
+                })
+        else:
+            for record in records:
+                if record.main_doctor_id and record.main_doctor_id.user_id:
+                    notices.append({
+                        'record': record,
+                        'user_ids': record.sudo().main_doctor_id.user_id.ids,
+                        'message': _("You have a new patient: %s at room: %s case : %s") % (record.patient_id.name, record.room_id.name if record.room_id else 'N/A', record.name),
+                        'date_deadline': record.admission_date + timedelta(hours=1),
+                    })
+        self.env['hms.notification']._send(notices)
+
+        records.filtered(lambda r: not r.sale_order_id)._create_sale_orders()
+
+        records._check_single_bed_use()
+        records.bed_id._occupy()
+        for room, cases in records.grouped(lambda r: r.bed_id.room_id).items():
+            cases.room_id = room
+        records._update_medical_record()
+
+        return records
+
+    def _assign_case_names(self):
+        """Name new cases ``CR/<patient>_#<n>`` from the case counter of their medical record."""
+        cases_by_record = self.filtered('patient_id').grouped('medical_record_id')
+        first_numbers = reserve_numbers(self.env, 'hms.medical.record', 'case_sequence', {
+            medical_record.id: len(cases) for medical_record, cases in cases_by_record.items()
+        })
+        for medical_record, cases in cases_by_record.items():
+            for number, case in enumerate(cases, start=first_numbers[medical_record.id]):
+                case.name = f"CR/{case.patient_id.name}_#{number}"
+
+    def _create_sale_orders(self):
+        """Create, fill and confirm the sale orders of new cases in one batch each."""
+        if not self:
+            return
+        doctor_timesheet_product = self.env.ref("hms.doctor_timesheet_service")
+        nurse_timesheet_product = self.env.ref("hms.nurse_timesheet_service")
+        orders = self.env['sale.order'].create([{
+            'partner_id': record.patient_id.id,
+            'origin': record.name,
+        } for record in self])
+
+        line_vals_list = []
+        for record, so in zip(self, orders):
+            record.sale_order_id = so.id
+            line_vals_list.append({
                 'order_id': so.id,
                 'product_id': doctor_timesheet_product.id,
                 'product_uom_qty': 1,
                 'price_unit': record.main_doctor_id.hourly_rate if record.main_doctor_id.hourly_rate else doctor_timesheet_product.list_price,
             })
             if record.nurse_id:
-                so_line_2 = self.env['sale.order.line'].create({
+                line_vals_list.append({
                     'order_id': so.id,
                     'product_id': nurse_timesheet_product.id,
                     'product_uom_qty': 1,
                     'price_unit': record.nurse_id[0].hourly_rate if record.nurse_id[0].hourly_rate else nurse_timesheet_product.list_price,
                 })
-            so.action_confirm()
-            record.doctor_task_id = so_line.task_id.id
-            if record.nurse_id:
-                record.nurse_task_id = so_line_2.task_id.id
-            
-        record.bed_id.state = 'occupied'
-        record.room_id = record.bed_id.room_id
-        record._update_medical_record()
-
+        lines = iter(self.env['sale.order.line'].create(line_vals_list))
+        orders.action_confirm()
 
-        return record
+        for record in self:
+            record.doctor_task_id = next(lines).task_id.id
+            if record.nurse_id:
+                record.nurse_task_id = next(lines).task_id.id
 
     def write(self, vals):
 
-        old_beds = {case.id: case.bed_id for case in self}
+        moved = self.filtered(lambda c: c.bed_id.id != vals['bed_id']) if 'bed_id' in vals else self.browse()
+        old_beds = moved.bed_id
 
         if 'state' in vals and vals['state'] == 'closed':
             for case in self:
@@ -283,30 +427,55 @@ class HmsCase(models.Model):
                 
         
         res = super().write(vals)
-        
+
+        if moved:
+            moved._check_single_bed_use()
+            old_beds.filtered(lambda b: b.state == 'occupied').write({'state': 'available'})
+            new_bed = moved.bed_id
+            if new_bed:
+                new_bed._occupy()
+                moved.room_id = new_bed.room_id
+
+        if 'state' in vals:
+            self.filtered(lambda c: c.state == 'closed').bed_id.write({'state': 'available'})
         for case in self:
-            new_bed = case.bed_id
-            old_bed = old_beds.get(case.id)
-
-            if 'bed_id' in vals:
-                if old_bed and old_bed != new_bed and old_bed.state == 'occupied':
-                    old_bed.state = 'available'
-                if new_bed and new_bed.state != 'occupied':
-                    if new_bed.state != 'available':
-                        raise UserError(_("Selected bed is not available."))
-                    new_bed.state = 'occupied'
-                    case.room_id = new_bed.room_id
-
-            if 'state' in vals and case.state == 'closed' and case.bed_id:
-                case.bed_id.state = 'available'
             case._update_medical_record()
 
         return res
 
+    def _check_single_bed_use(self):
+        beds = self.bed_id
+        if len(beds) != len(self.filtered('bed_id')):
+            raise UserError(_("A bed can only be assigned to one case."))
+        others = self.sudo().search_count([('bed_id', 'in', beds.ids), ('state', '!=', 'closed'), ('id', 'not in', self.ids)], limit=1)
+        if others:
+            raise UserError(_("Selected bed is already assigned to another case."))
+
+    def _stats_sources(self):
+        # prescriptions, lab requests and results are counted for the main doctor of their case
+        sources = super()._stats_sources()
+        cases = self.sudo()
+        sources['hms_prescription'] = set(cases.prescription_ids.ids)
+        sources['hms_lab_request'] = set(cases.lab_request_ids.ids)
+        sources['hms_lab_result'] = set(self.env['hms.lab.result'].sudo().search([('case_id', 'in', self.ids)]).ids)
+        return sources
+
     # ----------------------------
     # ACTIONS
     # ----------------------------
 
+    def action_allocate_bed(self):
+        """Give every open case without a bed the best free bed of its main doctor's department."""
+        cases = self.filtered(lambda c: not c.bed_id and c.state != 'closed')
+        Bed = self.env['hms.bed']
+        for department, department_cases in cases.grouped(lambda c: c.main_doctor_id.department_id).items():
+            beds = Bed._allocate(department=department or None, count=len(department_cases))
+            if len(beds) < len(department_cases):
+                raise UserError(_("Not enough free beds in %s.") % (department.name or _("the hospital")))
+            for case, bed in zip(department_cases, beds):
+                case.bed_id = bed
+        return True
+
     def action_activate(self):
         self.state = 'active'
 
@@ -314,84 +483,88 @@ class HmsCase(models.Model):
         self.state = 'closed'
 
     def action_close(self):
+        """Discharge the cases and invoice them, for any number of cases at once.
 
-        # Check if lab tests exist - ensure they are completed
-
-        if self.lab_request_ids:
-            pending_labs = self.lab_request_ids.filtered(
-                lambda r: r.state != 'completed'
-            )
-            if pending_labs:
-                lab_names = ", ".join(pending_labs.mapped('name'))
-                raise UserError(_(
-                    "Cannot close case with pending lab tests. "
-                    "The following lab requests are not completed: %s. "
-                    "Please ensure all lab tests are completed."
-                ) % lab_names)
-
-        # Check if prescriptions exist - ensure they are approved
-        if self.prescription_ids:
-            pending_prescriptions = self.prescription_ids.filtered(
-                lambda p: p.state != 'dispensed'
-            )
-            if pending_prescriptions:
-                prescription_names = ", ".join(pending_prescriptions.mapped('name'))
-                raise UserError(_(
-                    "Cannot close case with unapproved prescriptions. "
-                    "The following prescriptions are not approved: %s. "
-                    "Please ensure all prescriptions are approved."
-                ) % prescription_names)
+        Already closed cases are skipped.
+        """
+        cases = self.filtered(lambda c: c.state != 'closed')
+        if not cases:
+            return
+        cases._check_pending_before_close()
 
-        
-        
-        self.state = 'closed'
-        self.discharge_date =  fields.Datetime.now()
-        self.send_inbox_notification(self.sudo().nurse_id.user_id, _(f"patient {self.patient_id.name} at room: {self.room_id.name if self.room_id else 'N/A'} was discharged"), self.discharge_date + timedelta(hours=1))
-        self.send_inbox_notification(self.sudo().created_by.user_id, _(f"patient {self.patient_id.name} at room: {self.room_id.name if self.room_id else 'N/A'} was discharged"), self.discharge_date + timedelta(hours=1))
+        cases.write({'state': 'closed', 'discharge_date': fields.Datetime.now()})
+        self.env['hms.notification']._send([{
+            'record': case,
+            'user_ids': (case.sudo().nurse_id.user_id | case.sudo().created_by.user_id).ids,
+            'message': _(f"patient {case.patient_id.name} at room: {case.room_id.name if case.room_id else 'N/A'} was discharged"),
+            'date_deadline': case.discharge_date + timedelta(hours=1),
+        } for case in cases])
 
         # Compute stay_days when closing
-        self._compute_stay_days()
-
-        if self.stay_days and self.stay_days > 0:
-            staydays_product = self.env.ref("hms.product_room_stay")
-            self.env['sale.order.line'].create({
-                'order_id': self.sale_order_id.id,
-                'product_id': staydays_product.id,
-                'product_uom_qty': self.stay_days,
-                'price_unit': staydays_product.list_price,
-            })
-        if self.insurance_id and self.insurance_coverage > 0:
-                insurance_discount = - (self.total_cost * (self.insurance_coverage / 100))
-                
-                # Get or create insurance product
-                insurance_product = self.env['product.product'].search(
-                    [('default_code', '=', 'INSURANCE_COVERAGE')], limit=1)
-                
-                if not insurance_product:
-                    insurance_product = self.env['product.product'].create({
-                        'name': 'Insurance Coverage',
-                        'default_code': 'INSURANCE_COVERAGE',
-                        'type': 'service',
-                        'list_price': 0,
-                    })
-                self.env['sale.order.line'].create({
-                    'order_id': self.sale_order_id.id,
-                    'product_id': insurance_product.id,
-                    'product_uom_qty': 1,
-                    'price_unit': insurance_discount,
-                })
-        for line in self.consumable_line_ids:
-            self.env['sale.order.line'].create({
-                'order_id': self.sale_order_id.id,
-                'product_id': line.product_id.id,
-                'product_uom_qty': line.quantity,
-                'price_unit': line.product_id.list_price,
+        cases._compute_stay_days()
+
+        Billing = self.env['hms.billing']
+        staydays_product = self.env.ref("hms.product_room_stay")
+        insured_cases = cases.filtered(lambda c: c.insurance_id and c.insurance_coverage > 0)
+        insurance_product = insured_cases and self._get_insurance_product()
+        line_vals_list = []
+        for case in cases:
+            if case.stay_days and case.stay_days > 0:
+                line_vals_list.append(Billing._prepare_line(case.sale_order_id, staydays_product, case.stay_days))
+            if case in insured_cases:
+                insurance_discount = - (case.total_cost * (case.insurance_coverage / 100))
+                line_vals_list.append(Billing._prepare_line(case.sale_order_id, insurance_product, 1, insurance_discount))
+            line_vals_list += [
+                Billing._prepare_line(case.sale_order_id, line.product_id, line.quantity)
+                for line in case.consumable_line_ids
+            ]
+        Billing._add_order_lines(line_vals_list)
+        Billing._validate_pickings(cases.filtered('consumable_line_ids').sale_order_id)
+
+        to_invoice = cases.filtered(lambda c: not c.invoice_id and c.sale_order_id)
+        if to_invoice:
+            # one invoice per order, created in a single call
+            invoices = to_invoice.sale_order_id._create_invoices(grouped=True)
+            for case in to_invoice:
+                case.invoice_id = (case.sale_order_id.invoice_ids & invoices)[:1]
+
+    def _check_pending_before_close(self):
+        """Refuse to close cases with lab requests or prescriptions still pending."""
+        pending_labs = self.env['hms.lab.request'].search([
+            ('case_id', 'in', self.ids), ('state', '!=', 'completed'),
+        ])
+        if pending_labs:
+            lab_names = ", ".join(pending_labs.mapped('name'))
+            raise UserError(_(
+                "Cannot close case with pending lab tests. "
+                "The following lab requests are not completed: %s. "
+                "Please ensure all lab tests are completed."
+            ) % lab_names)
+
+        pending_prescriptions = self.env['hms.prescription'].search([
+            ('case_id', 'in', self.ids), ('state', '!=', 'dispensed'),
+        ])
+        if pending_prescriptions:
+            prescription_names = ", ".join(pending_prescriptions.mapped('name'))
+            raise UserError(_(
+                "Cannot close case with unapproved prescriptions. "
+                "The following prescriptions are not approved: %s. "
+                "Please ensure all prescriptions are approved."
+            ) % prescription_names)
+
+    @api.model
+    def _get_insurance_product(self):
+        # Get or create insurance product
+        insurance_product = self.env['product.product'].search(
+            [('default_code', '=', 'INSURANCE_COVERAGE')], limit=1)
+        if not insurance_product:
+            insurance_product = self.env['product.product'].create({
+                'name': 'Insurance Coverage',
+                'default_code': 'INSURANCE_COVERAGE',
+                'type': 'service',
+                'list_price': 0,
             })
-            for picking in self.sale_order_id.picking_ids:
-                    picking.button_validate()   
-        if not self.invoice_id:
-            invoice = self.sale_order_id._create_invoices()  # uses Odoo's sale.order method to generate invoice
-            self.invoice_id = invoice.id
+        return insurance_product
 
     def action_approve_invoice(self):
         for case in self:
@@ -415,43 +588,52 @@ class HmsCase(models.Model):
     
 
 
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Send hospital-specific inbox notification."""
-        if not user_id:
-            return
-
-        self.sudo().activity_schedule(
-            summary=f"Hospital Notification",
-            note=f"<div>{message_body}",
-            user_id=user_id.id,
-            date_deadline= date_deadline,
+    def init(self):
+        # fill the cost subtotals of existing cases once the line tables exist
+        if all(table_exists(self.env.cr, table) for table in COST_LINE_TABLES):
+            self._reconcile_costs()
+        ensure_overlap_constraint(
+            self.env.cr, self._table, 'hms_case_doctor_no_overlap',
+            "EXCLUDE USING gist (main_doctor_id WITH =, %s WITH &&) "
+            "WHERE (state != 'closed' AND admission_date IS NOT NULL) "
+            "DEFERRABLE INITIALLY DEFERRED" % ADMISSION_RANGE.format(''),
+            self._doctor_overlap_query(),
         )
-        
 
+    def _doctor_overlap_query(self, ids=None):
+        """Return the SQL selecting ``(id, other_id)`` for the open cases admitted
+        within 30 minutes of another one of the same doctor, among ``ids`` or all of them."""
+        return SQL(
+            """
+            SELECT c.id, other.id
+              FROM hms_case c
+              JOIN hms_case other
+                ON other.main_doctor_id = c.main_doctor_id
+               AND other.id != c.id
+               AND other.state != 'closed'
+               AND other.admission_date IS NOT NULL
+               AND %(other_range)s && %(range)s
+             WHERE c.state != 'closed' AND c.admission_date IS NOT NULL %(restrict)s
+            """,
+            other_range=SQL(ADMISSION_RANGE.format('other.')),
+            range=SQL(ADMISSION_RANGE.format('c.')),
+            restrict=SQL("AND c.id = ANY(%s)", ids) if ids is not None else SQL(),
+        )
 
     @api.constrains('main_doctor_id', 'admission_date', 'state')
     def _check_doctor_case_overlap(self):
-        for rec in self:
-            if rec.main_doctor_id and rec.admission_date and rec.state != 'closed':
-                # define 30-minute window
-                window_start = rec.admission_date - timedelta(minutes=30)
-                window_end = rec.admission_date + timedelta(minutes=30)
-
-                # search other cases for the same doctor
-                overlapping_cases = self.search([
-                    ('id', '!=', rec.id),
-                    ('main_doctor_id', '=', rec.main_doctor_id.id),
-                    ('state', '!=', 'closed'),
-                    ('admission_date', '>=', window_start),
-                    ('admission_date', '<=', window_end),
-                ])
-
-                if overlapping_cases:
-                    raise ValidationError(
-                        _("Doctor %s is already assigned to another case (%s) "
-                          "within 30 minutes of this admission time.")
-                        % (rec.main_doctor_id.name, overlapping_cases[0].name)
-                    )
+        # One query for the whole batch, served by the GiST index of the exclusion constraint.
+        self.flush_model(['main_doctor_id', 'admission_date', 'state'])
+        self.env.cr.execute(SQL("%s LIMIT 1", self._doctor_overlap_query(self.ids)))
+        row = self.env.cr.fetchone()
+        if row:
+            rec, other = self.browse(row[0]), self.sudo().browse(row[1])
+            raise ValidationError(
+                _("Doctor %s is already assigned to another case (%s) "
+                  "within 30 minutes of this admission time.")
+                % (rec.main_doctor_id.name, other.name)
+            )
+
     def action_print_case_summary(self):
         self.ensure_one()
 
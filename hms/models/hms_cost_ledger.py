@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from odoo import models, api
+
+# Cost subtotals kept on hms.case, as ``<category>_cost`` fields.
+COST_CATEGORIES = ('pharmacy', 'lab', 'consumable')
+
+
+def merge_cost_deltas(*deltas_list):
+    merged = defaultdict(float)
+    for deltas in deltas_list:
+        for key, amount in deltas.items():
+            merged[key] += amount
+    return merged
+
+
+class HmsCostLineMixin(models.AbstractModel):
+    """Apply the cost of billed lines to the subtotals of their case.
+
+    ``_cost_category`` is the subtotal the line counts in, ``_cost_case_field``
+    the path from the line to its case and ``_cost_fields`` the fields that
+    change its amount or its case.
+    """
+    _name = 'hms.cost.line.mixin'
+    _description = 'HMS Case Cost Line'
+
+    _cost_category = None
+    _cost_case_field = 'case_id'
+    _cost_fields = ('product_id', 'case_id')
+
+    def _cost_amount(self):
+        self.ensure_one()
+        return self.product_id.list_price
+
+    def _cost_deltas(self, sign=1):
+        """Return ``{(case_id, category): amount}`` of the lines, counted ``sign`` times."""
+        deltas = defaultdict(float)
+        for line in self:
+            case = line.mapped(self._cost_case_field)
+            if case:
+                deltas[case.id, self._cost_category] += sign * line._cost_amount()
+        return deltas
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hms.case']._apply_cost_deltas(records._cost_deltas())
+        return records
+
+    def write(self, vals):
+        if not any(field_name in vals for field_name in self._cost_fields):
+            return super().write(vals)
+        before = self._cost_deltas(-1)
+        res = super().write(vals)
+        self.env['hms.case']._apply_cost_deltas(merge_cost_deltas(before, self._cost_deltas()))
+        return res
+
+    def unlink(self):
+        deltas = self._cost_deltas(-1)
+        res = super().unlink()
+        self.env['hms.case']._apply_cost_deltas(deltas)
+        return res
+
+
+class HmsCostDocumentMixin(models.AbstractModel):
+    """Move the cost of its lines when a document changes case or is deleted.
+
+    Needed because the lines are deleted in cascade by the database.
+    """
+    _name = 'hms.cost.document.mixin'
+    _description = 'HMS Case Cost Document'
+
+    _cost_line_field = None
+
+    def write(self, vals):
+        if 'case_id' not in vals:
+            return super().write(vals)
+        lines = self.mapped(self._cost_line_field)
+        before = lines._cost_deltas(-1)
+        res = super().write(vals)
+        self.env['hms.case']._apply_cost_deltas(merge_cost_deltas(before, lines._cost_deltas()))
+        return res
+
+    def unlink(self):
+        deltas = self.mapped(self._cost_line_field)._cost_deltas(-1)
+        res = super().unlink()
+        self.env['hms.case']._apply_cost_deltas(deltas)
+        return res
@@ -0,0 +1,56 @@
+"""Race-free per-parent counters used to number cases, rooms and beds.
+
+A counter is an integer column on the parent table holding the last number
+given out. Numbers are reserved with ``UPDATE ... RETURNING``, whose row lock
+serializes concurrent transactions numbering children of the same parent.
+"""
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists, table_exists
+
+
+def reserve_numbers(env, model_name, column, counts):
+    """Reserve ``counts[parent_id]`` numbers on each parent of ``model_name``.
+
+    :return: ``{parent_id: first reserved number}``
+    """
+    counts = {parent_id: count for parent_id, count in counts.items() if parent_id and count}
+    if not counts:
+        return {}
+    Model = env[model_name]
+    env.cr.execute(SQL(
+        """
+        UPDATE %(table)s AS t
+           SET %(column)s = COALESCE(t.%(column)s, 0) + c.count
+          FROM (SELECT unnest(%(ids)s::int[]) AS id, unnest(%(counts)s::int[]) AS count) AS c
+         WHERE t.id = c.id
+     RETURNING t.id, t.%(column)s - c.count + 1
+        """,
+        table=SQL.identifier(Model._table),
+        column=SQL.identifier(column),
+        ids=list(counts),
+        counts=list(counts.values()),
+    ))
+    first_numbers = dict(env.cr.fetchall())
+    Model.invalidate_model([column])
+    return first_numbers
+
+
+def init_counter(cr, table, column, child_table, parent_column):
+    """Start the unset counters of ``table`` at the number of their children."""
+    if not table_exists(cr, child_table) or not column_exists(cr, table, column):
+        return
+    cr.execute(SQL(
+        """
+        UPDATE %(table)s AS t
+           SET %(column)s = c.count
+          FROM (SELECT %(parent)s AS id, COUNT(*) AS count
+                  FROM %(child_table)s
+                 WHERE %(parent)s IS NOT NULL
+                 GROUP BY %(parent)s) AS c
+         WHERE t.id = c.id AND t.%(column)s IS NULL
+        """,
+        table=SQL.identifier(table),
+        column=SQL.identifier(column),
+        child_table=SQL.identifier(child_table),
+        parent=SQL.identifier(parent_column),
+    ))
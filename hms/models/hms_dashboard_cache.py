@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.tools import SQL
+
+# Role tags stored in the cache key, derived from the user's HMS groups.
+DASHBOARD_ROLES = {
+    'doctor': 'hms.group_hms_doctor',
+    'nurse': 'hms.group_hms_nurse',
+    'lab': 'hms.group_hms_lab_attendant',
+    'chemist': 'hms.group_hms_chemist',
+    'reception': 'hms.group_hms_receptionist',
+    'admin': 'base.group_system',
+}
+ALL_ROLES = frozenset(DASHBOARD_ROLES)
+
+CacheKey = namedtuple('CacheKey', 'dbname payload args uid roles company_id lang bucket stamp')
+
+
+def stamp_targets(user_ids=(), roles=()):
+    """Targets of ``hms.dashboard.stamp`` for ``user_ids`` and ``roles``."""
+    return [f'user:{user_id}' for user_id in user_ids] + [f'role:{role}' for role in roles]
+
+
+class DashboardCache:
+    """Thread-safe LRU cache of dashboard payloads with a per-entry TTL.
+
+    The cache is local to the worker. Entries are keyed on the versions of
+    ``hms.dashboard.stamp`` they were computed with, so a change committed
+    by any worker makes every worker miss them; stale entries age out.
+    """
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dashboard_cache = DashboardCache()
+
+
+class HmsDashboardStamp(models.Model):
+    """Version of the dashboard payloads of a user or a role, shared by all workers."""
+    _name = 'hms.dashboard.stamp'
+    _description = 'HMS Dashboard Cache Stamp'
+    _log_access = False
+
+    payload = fields.Char(string='Payload', required=True, readonly=True)
+    target = fields.Char(string='Target', required=True, readonly=True, help="'user:<id>' or 'role:<role>'")
+    version = fields.Integer(string='Version', default=0, required=True, readonly=True)
+
+    _payload_target_uniq = models.Constraint('UNIQUE(payload, target)', "A dashboard stamp must be unique.")
+
+    @api.model
+    def _get_versions(self, payload, targets):
+        """Return the ``(target, version)`` pairs of ``payload`` for ``targets``."""
+        self.env.cr.execute(SQL(
+            "SELECT target, version FROM hms_dashboard_stamp WHERE payload = %s AND target = ANY(%s) ORDER BY target",
+            payload, list(targets),
+        ))
+        return tuple(self.env.cr.fetchall())
+
+    @api.model
+    def _bump(self, stamps):
+        """Increment the versions of ``stamps``, a collection of ``(payload, target)``."""
+        if not stamps:
+            return
+        # sorted, so concurrent bumps lock the rows in the same order
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO hms_dashboard_stamp (payload, target, version) VALUES %s
+            ON CONFLICT (payload, target) DO UPDATE SET version = hms_dashboard_stamp.version + 1
+            """,
+            SQL(", ").join(SQL("(%s, %s, 1)", payload, target) for payload, target in sorted(stamps)),
+        ))
+
+
+class HmsDashboardCacheMixin(models.AbstractModel):
+    """Invalidate the cached dashboard payloads affected by a change.
+
+    Models inheriting this mixin describe who sees them on the dashboard
+    through ``_dashboard_cache_targets``; only writes touching
+    ``_dashboard_cache_fields`` (all fields when empty) invalidate anything.
+    """
+    _name = 'hms.dashboard.cache.mixin'
+    _description = 'HMS Dashboard Cache Invalidation'
+
+    _dashboard_cache_fields = ()
+
+    def _dashboard_cache_targets(self):
+        """Return ``{payload: (user_ids, roles)}`` whose cached entries show ``self``."""
+        return {}
+
+    def _invalidate_dashboard_cache(self):
+        stamps = {
+            (payload, target)
+            for payload, (user_ids, roles) in self.sudo()._dashboard_cache_targets().items()
+            for target in stamp_targets(user_ids, roles)
+        }
+        if not stamps:
+            return
+        pending = self.env.cr.postcommit.data.get('hms.dashboard.stamps')
+        if pending is None:
+            pending = self.env.cr.postcommit.data['hms.dashboard.stamps'] = set()
+            registry = self.env.registry
+
+            # Only bump once the change is visible to other transactions,
+            # otherwise a concurrent request could cache the old values under
+            # the new versions. The bump is a short transaction of its own.
+            @self.env.cr.postcommit.add
+            def invalidate():
+                with registry.cursor() as cr:
+                    api.Environment(cr, SUPERUSER_ID, {})['hms.dashboard.stamp']._bump(pending)
+        pending.update(stamps)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._invalidate_dashboard_cache()
+        return records
+
+    def write(self, vals):
+        relevant = not self._dashboard_cache_fields or any(f in vals for f in self._dashboard_cache_fields)
+        if relevant:
+            self._invalidate_dashboard_cache()
+        res = super().write(vals)
+        if relevant:
+            self._invalidate_dashboard_cache()
+        return res
+
+    def unlink(self):
+        self._invalidate_dashboard_cache()
+        return super().unlink()
+
+
+class MailActivity(models.Model):
+    _inherit = ['mail.activity', 'hms.dashboard.cache.mixin']
+
+    def _dashboard_cache_targets(self):
+        return {'dashboard': (self.user_id.ids, ())}
+
+
+class StockQuant(models.Model):
+    _inherit = ['stock.quant', 'hms.dashboard.cache.mixin']
+    _dashboard_cache_fields = ('quantity', 'reserved_quantity')
+
+    def _dashboard_cache_targets(self):
+        return {'dashboard': ((), ('chemist',))}
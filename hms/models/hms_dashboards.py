@@ -1,5 +1,24 @@
 from odoo import models, fields, api, _
-from datetime import timedelta, datetime
+from odoo.tools import SQL
+from datetime import timedelta, datetime, time
+
+import pytz
+
+from .hms_dashboard_cache import DASHBOARD_ROLES, CacheKey, dashboard_cache, stamp_targets
+
+# Dashboard sections in the order they are applied: when a user has several
+# roles, a later section overwrites the keys written by an earlier one.
+DASHBOARD_SECTIONS = {
+    'doctor': ('today_appointments', 'draft_cases', 'active_cases', 'consultation_cases', 'kpi'),
+    'nurse': ('draft_cases', 'active_cases', 'today_appointments', 'kpi'),
+    'lab': ('active_cases', 'kpi'),
+    'chemist': ('active_cases', 'kpi', 'pharmacy_queue'),
+    'reception': ('kpi', 'registered_patients', 'draft_appointments', 'active_cases', 'free_beds'),
+}
+
+# Trend windows (in days) the dashboard charts can be requested for.
+TREND_WINDOWS = (7, 30, 90, 365)
+
 
 class HmsDashboard(models.TransientModel):
     _name = 'hms.dashboard'
@@ -9,6 +28,52 @@ class HmsDashboard(models.TransientModel):
 
     @api.model
     def get_dashboard_data(self):
+        return self._get_cached_payload('dashboard', self._get_dashboard_payload)
+
+    @api.model
+    def get_chart_data(self, days=7):
+        """Chart payload; ``days`` is the trend window, one of ``TREND_WINDOWS``.
+
+        Any other value, numeric or not, falls back to the 7-day window.
+        """
+        try:
+            days = int(days)
+        except (TypeError, ValueError):
+            days = 7
+        if days not in TREND_WINDOWS:
+            days = 7
+        return self._get_cached_payload('chart', lambda: self._get_chart_payload(days), args=(days,))
+
+    @api.model
+    def _get_cached_payload(self, payload, compute, args=()):
+        """Return ``compute()``, cached per user, role set, company, language and day.
+
+        The key holds the ``hms.dashboard.stamp`` versions of the user and
+        roles, bumped by the changes of the records shown on the dashboard.
+        """
+        user = self.env.user
+        roles = frozenset(role for role, group in DASHBOARD_ROLES.items() if user.has_group(group))
+        key = CacheKey(
+            dbname=self.env.cr.dbname,
+            payload=payload,
+            args=args,
+            uid=user.id,
+            roles=roles,
+            company_id=self.env.company.id,
+            lang=self.env.lang,
+            bucket=(fields.Date.today(), fields.Date.context_today(self)),
+            stamp=self.env['hms.dashboard.stamp']._get_versions(payload, stamp_targets([user.id], roles)),
+        )
+        value = dashboard_cache.get(key)
+        if value is None:
+            value = compute()
+            ttl = int(self.env['ir.config_parameter'].sudo().get_param('hms.dashboard_cache_ttl', 300))
+            if ttl > 0:
+                dashboard_cache.set(key, value, ttl)
+        return value
+
+    @api.model
+    def _get_dashboard_payload(self):
         user = self.env.user
         now = fields.Datetime.now()
         start = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -33,277 +98,24 @@ class HmsDashboard(models.TransientModel):
             'activities': self._get_user_activities(),
         }
 
+        sections = [section for section, enabled in (
+            ('doctor', data['is_doctor'] and employee_id),
+            ('nurse', data['is_nurse'] and employee_id),
+            ('lab', data['is_lab'] and employee_id),
+            ('chemist', data['is_chemist']),
+            ('reception', data['is_receptionist'] or data['is_admin']),
+        ) if enabled]
 
-        # -------------------- Doctor --------------------
+        # Only build each key for the last section writing it, the others
+        # would be overwritten anyway.
+        owners = {}
+        for section in sections:
+            for key in DASHBOARD_SECTIONS[section]:
+                owners[key] = section
 
-        if data.get('is_doctor') and employee_id:
-
-           
-
-            # KPI counts (confirmed appointments only)
-            active_cases = self.env['hms.case'].search_count([
-                ('main_doctor_id', '=', employee_id),
-                ('state', '=', 'active')
-            ])
-            confirmed_appts_today = self.env['hms.appointment'].search_count([
-                ('doctor_id', '=', employee_id),
-                ('state', '=', 'confirmed'),
-                ('date', '>=', start),
-                ('date', '<', end)
-            ])
-            lab_results_received = self.env['hms.lab.result'].search_count([
-                ('case_id.main_doctor_id', '=', employee_id),
-                ('lab_request_line_id.lab_request_id.state', '=', 'Completed'),
-            ])
-
-            # Listings
-            confirmed_appts = self.env['hms.appointment'].search([
-                ('doctor_id', '=', employee_id),
-                ('state', '=', 'confirmed'),
-                ('date', '>=', start),
-                ('date', '<', end)
-            ], order='date asc')
-            data['today_appointments'] = [{
-                'id': a.id,
-                'patient_name': a.patient_id.name,
-                'date': a.date.isoformat() if a.date else '',
-                'model': 'hms.appointment',
-                'res_id': a.id,
-            } for a in confirmed_appts]
-
-            draft_cases = self.env['hms.case'].search([
-                ('main_doctor_id', '=', employee_id),
-                ('state', '=', 'draft')
-            ], order='admission_date desc', limit=10)
-            data['draft_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id
-            } for c in draft_cases]
-
-            open_cases = self.env['hms.case'].search([
-                ('main_doctor_id', '=', employee_id),
-                ('state', '=', 'active')
-            ], order='admission_date desc', limit=10)
-            data['active_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id,
-            } for c in open_cases]
-
-            consultation_cases = self.env['hms.case'].search([
-                ('consulting_doctor_ids', '=', employee_id),
-                ('state', 'in', ['draft', 'active'])
-            ])
-            data['consultation_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id
-            } for c in consultation_cases]
-
-            data['kpi'] = {
-                'active_cases': active_cases,
-                'appointments_today': confirmed_appts_today,
-                'lab_results_received': lab_results_received,
-                'consultation_cases': len(consultation_cases)
-            }
-
-        # -------------------- Nurse --------------------
-        if data.get('is_nurse') and employee_id:
-
-           
-
-            assigned_cases = self.env['hms.case'].search_count([
-                ('nurse_id', '=', employee_id),
-                ('state', '=', 'active')
-            ])
-            appts_today = self.env['hms.appointment'].search_count([
-                ('case_id.nurse_id', '=', employee_id),
-                ('date', '>=', start),
-                ('date', '<', end)
-            ])
-            pending_lab_results = self.env['hms.lab.result'].search_count([
-                ('case_id.nurse_id', '=', employee_id),
-                ('lab_request_id.state', '=', 'draft')
-            ])
-
-
-            # Draft & Active cases
-            draft_cases = self.env['hms.case'].search([
-                ('nurse_id', '=', employee_id),
-                ('state', '=', 'draft')
-            ], order='admission_date desc', limit=10)
-            data['draft_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id
-            } for c in draft_cases]
-
-            open_cases = self.env['hms.case'].search([
-                ('nurse_id', '=', employee_id),
-                ('state', '=', 'active')
-            ], order='admission_date desc', limit=10)
-            data['active_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id,
-            } for c in open_cases]
-
-            # Today's appointments (confirmed)
-            nurse_today_appts = self.env['hms.appointment'].search([
-                ('case_id.nurse_id', '=', employee_id),
-                ('state', '=', 'confirmed'),
-                ('date', '>=', start),
-                ('date', '<', end)
-            ], order='date asc')
-            data['today_appointments'] = [{
-                'id': a.id,
-                'patient_name': a.patient_id.name,
-                'date': a.date.isoformat() if a.date else '',
-                'model': 'hms.appointment',
-                'res_id': a.id,
-            } for a in nurse_today_appts]
-
-        
-
-
-            
-            data['kpi'] = {
-                'assigned_cases': assigned_cases,
-                'appointments_today': appts_today,
-                'pending_lab_results': pending_lab_results,
-            }
-
-
-        # -------------------- Lab --------------------
-        if data['is_lab'] and employee_id:
-            
-            pending_requests_count = self.env['hms.lab.request'].search_count([
-            ('state', '=', 'draft')
-            ])
-            results_to_validate = self.env['hms.lab.result'].search_count([
-            ('lab_request_id.state', '=', 'completed')
-            ])
-            tests_today = self.env['hms.lab.request'].search_count([
-            ('date_requested', '>=', start),
-            ('date_requested', '<', end)
-            ])
-            open_cases = self.env['hms.case'].search([
-                ('state', '=', 'active'),
-                ('lab_request_ids', '!=', False)
-            ], order='admission_date desc', limit=10)
-            data['active_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id,
-            } for c in open_cases]
-
-                    
-            data['kpi'] = {
-            'pending_requests': pending_requests_count,
-            'results_to_validate': results_to_validate,
-            'tests_today': tests_today
-            }
-            
-
-        # -------------------- Chemist --------------------
-        if data['is_chemist']:
-            prescriptions_to_dispense_count = self.env['hms.prescription'].search_count([
-            ('state', '=', 'confirmed')
-            ])
-            open_cases = self.env['hms.case'].search([
-                ('prescription_ids', '!=', False),
-                ('state', '=', 'active')
-            ], order='admission_date desc', limit=10)
-            data['active_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id,
-            } for c in open_cases]
-            data['kpi'] = {'prescriptions_to_dispense': prescriptions_to_dispense_count}
-            
-
-        # -------------------- Reception/Admin --------------------
-
-        if data['is_receptionist'] or data['is_admin']:
-            
-            patients_today = self.env['res.partner'].search_count([
-                ('is_patient', '=', True),
-                ('create_date', '>=', start),
-                ('create_date', '<', end)
-            ])
-            appts_today = self.env['hms.appointment'].search_count([
-                ('date', '>=', start),
-                ('date', '<', end)
-            ])
-            open_cases = self.env['hms.case'].search_count([('state', '=', 'active')])
-            admissions_today = self.env['hms.case'].search_count([
-                ('state', '=', 'active'),
-                ('admission_date', '>=', start),
-                ('admission_date', '<', end)
-            ])
-            data['kpi'] = {
-                'patients_today': patients_today,
-                'appointments_today': appts_today,
-                'open_cases': open_cases,
-                'admissions_today': admissions_today
-            }
-
-            # Registered patients (from registration page, most recent first)
-            reg_patients = self.env['res.partner'].sudo().search([
-                ('is_patient', '=', True),
-                ('outsider_patient', '=', True)
-            ], order='create_date desc', limit=10)
-            data['registered_patients'] = [
-                {'id': p.id, 'name': p.name, 'date': p.create_date.strftime('%Y-%m-%d %H:%M') if p.create_date else '', 'model': 'res.partner',
-                    'res_id': p.id,} for p in reg_patients
-            ]
-
-            # Appointments in draft state, sorted by date
-            draft_appts = self.env['hms.appointment'].sudo().search([
-                ('state', '=', 'draft')
-            ], order='date asc', limit=10)
-            data['draft_appointments'] = [
-                {
-                    'id': a.id,
-                    'patient_name': a.patient_id.name,
-                    'date': a.date.strftime('%Y-%m-%d %H:%M') if a.date else '',
-                    'model': 'hms.appointment',
-                    'res_id': a.id,
-                } for a in draft_appts
-            ]
-            open_cases = self.env['hms.case'].search([
-                ('state', '=', 'active')
-            ], order='admission_date desc', limit=10)
-            data['active_cases'] = [{
-                'id': c.id,
-                'name': c.name,
-                'state': c.state,
-                'date': c.admission_date.isoformat() if c.admission_date else '',
-                'model': 'hms.case',
-                'res_id': c.id,
-            } for c in open_cases]
+        counts = self._get_kpi_counts([owners['kpi']], employee_id, start, end) if 'kpi' in owners else {}
+        for key, section in owners.items():
+            data[key] = self._get_section_value(section, key, employee_id, start, end, counts)
 
 
         # -------------------- Quick Actions --------------------
@@ -360,6 +172,153 @@ class HmsDashboard(models.TransientModel):
 
         return data
 
+    def _get_section_value(self, section, key, employee_id, start, end, counts):
+        """Build the value of dashboard ``key`` as written by ``section``."""
+        Case = self.env['hms.case']
+        Appointment = self.env['hms.appointment']
+
+        if key == 'kpi':
+            return counts.get(section, {})
+
+        if key == 'today_appointments':
+            doctor_field = 'doctor_id' if section == 'doctor' else 'case_id.nurse_id'
+            return self._appointment_rows(Appointment.search([
+                (doctor_field, '=', employee_id),
+                ('state', '=', 'confirmed'),
+                ('date', '>=', start),
+                ('date', '<', end)
+            ], order='date asc'), iso=True)
+
+        if key == 'draft_cases':
+            doctor_field = 'main_doctor_id' if section == 'doctor' else 'nurse_id'
+            return self._case_rows(Case.search([
+                (doctor_field, '=', employee_id),
+                ('state', '=', 'draft')
+            ], order='admission_date desc', limit=10))
+
+        if key == 'active_cases':
+            domain = {
+                'doctor': [('main_doctor_id', '=', employee_id)],
+                'nurse': [('nurse_id', '=', employee_id)],
+                'lab': [('lab_request_ids', '!=', False)],
+                'chemist': [('prescription_ids', '!=', False)],
+                'reception': [],
+            }[section]
+            return self._case_rows(Case.search(
+                domain + [('state', '=', 'active')], order='admission_date desc', limit=10))
+
+        if key == 'consultation_cases':
+            return self._case_rows(Case.search([
+                ('consulting_doctor_ids', '=', employee_id),
+                ('state', 'in', ['draft', 'active'])
+            ]))
+
+        if key == 'registered_patients':
+            # Registered patients (from registration page, most recent first)
+            reg_patients = self.env['res.partner'].sudo().search([
+                ('is_patient', '=', True),
+                ('outsider_patient', '=', True)
+            ], order='create_date desc', limit=10)
+            return [
+                {'id': p.id, 'name': p.name, 'date': p.create_date.strftime('%Y-%m-%d %H:%M') if p.create_date else '', 'model': 'res.partner',
+                    'res_id': p.id,} for p in reg_patients
+            ]
+
+        if key == 'draft_appointments':
+            # Appointments in draft state, sorted by date
+            return self._appointment_rows(Appointment.sudo().search([
+                ('state', '=', 'draft')
+            ], order='date asc', limit=10), iso=False)
+
+        if key == 'pharmacy_queue':
+            return self.env['hms.pharmacy.queue'].get_metrics()
+
+        if key == 'free_beds':
+            return self.env['hms.bed'].get_free_beds_by_department()
+
+    def _case_rows(self, cases):
+        return [{
+            'id': c.id,
+            'name': c.name,
+            'state': c.state,
+            'date': c.admission_date.isoformat() if c.admission_date else '',
+            'model': 'hms.case',
+            'res_id': c.id,
+        } for c in cases]
+
+    def _appointment_rows(self, appointments, iso=True):
+        return [{
+            'id': a.id,
+            'patient_name': a.patient_id.name,
+            'date': (a.date.isoformat() if iso else a.date.strftime('%Y-%m-%d %H:%M')) if a.date else '',
+            'model': 'hms.appointment',
+            'res_id': a.id,
+        } for a in appointments]
+
+    @api.model
+    def _get_kpi_counts(self, sections, employee_id, start, end):
+        """Count the KPIs of every section in ``sections`` in one query.
+
+        Each KPI is a scalar subquery counting the query of ``_search`` on its
+        domain: the counts use the indexes and apply the record rules as a
+        ``search_count`` would, in a single round trip. Returns
+        ``{section: {kpi: count}}``.
+        """
+        def today(field_name):
+            return [(field_name, '>=', start), (field_name, '<', end)]
+
+        sources = {
+            'hms.case': [
+                ('doctor', 'active_cases', [('main_doctor_id', '=', employee_id), ('state', '=', 'active')]),
+                ('doctor', 'consultation_cases', [('consulting_doctor_ids', '=', employee_id), ('state', 'in', ('draft', 'active'))]),
+                ('nurse', 'assigned_cases', [('nurse_id', '=', employee_id), ('state', '=', 'active')]),
+                ('reception', 'open_cases', [('state', '=', 'active')]),
+                ('reception', 'admissions_today', [('state', '=', 'active')] + today('admission_date')),
+            ],
+            'hms.appointment': [
+                ('doctor', 'appointments_today', [('doctor_id', '=', employee_id), ('state', '=', 'confirmed')] + today('date')),
+                ('nurse', 'appointments_today', [('case_id.nurse_id', '=', employee_id)] + today('date')),
+                ('reception', 'appointments_today', today('date')),
+            ],
+            'hms.lab.result': [
+                ('doctor', 'lab_results_received', [
+                    ('case_id.main_doctor_id', '=', employee_id),
+                    ('lab_request_line_id.lab_request_id.state', '=', 'completed'),
+                ]),
+                ('nurse', 'pending_lab_results', [('case_id.nurse_id', '=', employee_id), ('lab_request_id.state', '=', 'draft')]),
+                ('lab', 'results_to_validate', [('lab_request_id.state', '=', 'completed')]),
+            ],
+            'hms.lab.request': [
+                ('lab', 'pending_requests', [('state', '=', 'draft')]),
+                ('lab', 'tests_today', today('date_requested')),
+            ],
+            'hms.prescription': [
+                ('chemist', 'prescriptions_to_dispense', [('state', '=', 'confirmed')]),
+            ],
+            'res.partner': [
+                ('reception', 'patients_today', [('is_patient', '=', True)] + today('create_date')),
+            ],
+        }
+
+        columns = []
+        for model_name, kpis in sources.items():
+            Model = self.env[model_name]
+            for section, kpi, domain in kpis:
+                if section in sections:
+                    columns.append(SQL(
+                        "(SELECT COUNT(*) FROM (%s) AS s) AS %s",
+                        Model._search(domain).subselect(), SQL.identifier(f"{section}__{kpi}"),
+                    ))
+        if not columns:
+            return {}
+
+        self.env.cr.execute(SQL("SELECT %s", SQL(", ").join(columns)))
+        counts = {section: {} for section in sections}
+        for column, value in self.env.cr.dictfetchone().items():
+            section, kpi = column.split('__')
+            counts[section][kpi] = value
+        return counts
+
     @api.model
     def get_form_action(self, model_name, record_id):
         """
@@ -385,7 +344,7 @@ class HmsDashboard(models.TransientModel):
         }
 
     @api.model
-    def get_chart_data(self):
+    def _get_chart_payload(self, days=7):
         user = self.env.user
 
         # Case distribution (common for all)
@@ -393,8 +352,9 @@ class HmsDashboard(models.TransientModel):
         case_labels = [d.get('state') or 'Undefined' for d in case_data]
         case_values = [d.get('state_count', 0) for d in case_data]
 
-        today = fields.Date.context_today(self)
-        days, counts = [], []
+        # The days are those of the daily statistics, whatever the user's timezone
+        today = fields.Date.context_today(self.with_context(tz=self.env['hms.stats.daily']._get_tz()))
+        series = []
         chart_title = "No Data"
 
         # Role checks
@@ -402,58 +362,80 @@ class HmsDashboard(models.TransientModel):
         is_chemist = user.has_group('hms.group_hms_chemist')
         is_lab = user.has_group('hms.group_hms_lab_attendant')
 
+        # Long windows read the daily statistics when the user may see every
+        # record of the trend anyway; they are not filtered by record rules.
+        Stats = self.env['hms.stats.daily'].sudo()
+        use_stats = days >= 30
         if is_doctor_or_nurse:
-            # 14-day window (past 7 + future 7)
+            # Past window + next 7 days
             chart_title = _("Appointments Trend")
-            for i in range(-7, 8):
-                day = today + timedelta(days=i)
-                start_dt = fields.Datetime.to_string(datetime.combine(day, datetime.min.time()))
-                end_dt = fields.Datetime.to_string(datetime.combine(day, datetime.max.time()))
-
-                count = self.env['hms.appointment'].search_count([
-                    ('date', '>=', start_dt),
-                    ('date', '<=', end_dt)
-                ])
-                days.append(day.strftime('%b %d'))
-                counts.append(count)
+            first_day, last_day = today - timedelta(days=days), today + timedelta(days=7)
+            if use_stats and (user.has_group('hms.group_hms_receptionist') or user.has_group('base.group_system')):
+                series = Stats._get_series('appointments', first_day, last_day)
+            else:
+                series = self._get_daily_counts('hms.appointment', 'date', first_day, last_day)
 
         elif is_chemist:
-            # Only last 7 days
             chart_title = _("Prescriptions Trend")
-            for i in range(6, -1, -1):
-                day = today - timedelta(days=i)
-                start_dt = fields.Datetime.to_string(datetime.combine(day, datetime.min.time()))
-                end_dt = fields.Datetime.to_string(datetime.combine(day, datetime.max.time()))
-
-                count = self.env['hms.prescription'].search_count([
-                    ('date', '>=', start_dt),
-                    ('date', '<=', end_dt)
-                ])
-                days.append(day.strftime('%b %d'))
-                counts.append(count)
+            first_day = today - timedelta(days=days - 1)
+            if use_stats:
+                series = Stats._get_series('prescriptions', first_day, today)
+            else:
+                series = self._get_daily_counts('hms.prescription', 'date', first_day, today)
 
         elif is_lab:
-            # Only last 7 days
             chart_title = _("Lab Requests Trend")
-            for i in range(6, -1, -1):
-                day = today - timedelta(days=i)
-                start_dt = fields.Datetime.to_string(datetime.combine(day, datetime.min.time()))
-                end_dt = fields.Datetime.to_string(datetime.combine(day, datetime.max.time()))
-
-                count = self.env['hms.lab.request'].search_count([
-                    ('date_requested', '>=', start_dt),
-                    ('date_requested', '<=', end_dt)
-                ])
-                days.append(day.strftime('%b %d'))
-                counts.append(count)
+            first_day = today - timedelta(days=days - 1)
+            if use_stats:
+                series = Stats._get_series('lab_requests', first_day, today)
+            else:
+                series = self._get_daily_counts('hms.lab.request', 'date_requested', first_day, today)
+
+        labels = [day.strftime('%b %d') for day, _count in series]
+        counts = [count for _day, count in series]
 
         return {
             'case_labels': case_labels,
             'case_values': case_values,
-            'trend_labels': days,
+            'trend_labels': labels,
             'trend_values': counts,
             'trend_title': chart_title,
         }
+
+    @api.model
+    def _get_daily_counts(self, model_name, date_field, first_day, last_day, domain=None):
+        """Count ``model_name`` records per day of ``date_field`` with one grouped query.
+
+        Days run from ``first_day`` to ``last_day`` included, in the timezone
+        of the daily statistics so both trend sources agree; days without
+        records are returned with a zero count.
+
+        :return: list of ``(date, count)`` tuples, oldest first
+        """
+        Model = self.env[model_name]
+        tz_name = self.env['hms.stats.daily']._get_tz()
+        start, end = first_day, last_day + timedelta(days=1)
+        if Model._fields[date_field].type == 'datetime':
+            tz = pytz.timezone(tz_name)
+            start, end = (
+                tz.localize(datetime.combine(day, time.min)).astimezone(pytz.utc).replace(tzinfo=None)
+                for day in (start, end)
+            )
+
+        groups = Model.with_context(tz=tz_name)._read_group(
+            (domain or []) + [(date_field, '>=', start), (date_field, '<', end)],
+            groupby=[f'{date_field}:day'],
+            aggregates=['__count'],
+        )
+        counts = {}
+        for day, count in groups:
+            if isinstance(day, datetime):
+                day = day.date()
+            counts[day] = count
+        return [
+            (first_day + timedelta(days=offset), counts.get(first_day + timedelta(days=offset), 0))
+            for offset in range((last_day - first_day).days + 1)
+        ]
     def _get_user_activities(self):
         """Fetch activities for the current user, safely handling priority."""
         activities = self.env['mail.activity'].search([
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from odoo import models, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL, float_compare
+
+
+class HmsDispensing(models.AbstractModel):
+    """Check the pharmacy stock of prescriptions and lab requests.
+
+    Quantities are summed per product over all the documents, the quants of
+    the pharmacy locations are locked and read once, and every shortage is
+    reported in a single error.
+    """
+    _name = 'hms.dispensing'
+    _description = 'HMS Dispensing'
+
+    @api.model
+    def _get_pharmacy_locations(self):
+        """Internal locations flagged as pharmacy, and their children.
+
+        Falls back to the main stock location when no pharmacy is configured,
+        then to any internal location.
+        """
+        Location = self.env['stock.location'].sudo()
+        pharmacies = Location.search([('is_pharmacy', '=', True)])
+        if not pharmacies:
+            pharmacies = self.env.ref('stock.stock_location_stock', raise_if_not_found=False) or Location
+        if not pharmacies:
+            pharmacies = Location.search([('usage', '=', 'internal')], limit=1)
+        if not pharmacies:
+            raise UserError(_("No pharmacy or internal location configured. Please configure a stock location first."))
+        return Location.search([('id', 'child_of', pharmacies.ids), ('usage', '=', 'internal')])
+
+    @api.model
+    def _get_requirements(self, prescriptions=None, lab_requests=None):
+        """Return ``{product: quantity}`` needed by the documents, in the product unit."""
+        requirements = defaultdict(float)
+        for line in (prescriptions or self.env['hms.prescription']).prescription_line_ids:
+            quantity = line.quantity
+            if line.uom_id and line.uom_id != line.product_id.uom_id:
+                quantity = line.uom_id._compute_quantity(quantity, line.product_id.uom_id)
+            requirements[line.product_id] += quantity
+        for line in (lab_requests or self.env['hms.lab.request']).lab_request_line_ids:
+            requirements[line.product_id] += 1
+        return requirements
+
+    @api.model
+    def _get_available_quantities(self, products, locations):
+        """Return ``{product_id: unreserved quantity}`` over ``locations``, in one grouped read."""
+        groups = self.env['stock.quant'].sudo()._read_group(
+            [('product_id', 'in', products.ids), ('location_id', 'in', locations.ids)],
+            groupby=['product_id'],
+            aggregates=['quantity:sum', 'reserved_quantity:sum'],
+        )
+        return {product.id: quantity - reserved for product, quantity, reserved in groups}
+
+    @api.model
+    def _check_and_lock(self, requirements):
+        """Lock the pharmacy stock of ``requirements`` and check it is enough.
+
+        This serializes and checks, it does not reserve: no stock.move or
+        reserved quantity is created. The quants stay locked until the end of
+        the transaction, so concurrent dispensations of the same products
+        wait for each other instead of both consuming the last units. Stock
+        has to be consumed in the same transaction for the check to hold.
+
+        :param requirements: ``{product: quantity}``, see ``_get_requirements``
+        :raise UserError: listing every product short of stock
+        """
+        requirements = {product: quantity for product, quantity in requirements.items() if product.is_storable}
+        if not requirements:
+            return
+        products = self.env['product.product'].union(*requirements)
+        locations = self._get_pharmacy_locations()
+        self.env['stock.quant'].flush_model(['product_id', 'location_id', 'quantity', 'reserved_quantity'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT id FROM stock_quant
+             WHERE product_id = ANY(%s) AND location_id = ANY(%s)
+             ORDER BY id
+               FOR UPDATE
+            """,
+            products.ids, locations.ids,
+        ))
+        self.env['stock.quant'].invalidate_model(['quantity', 'reserved_quantity'])
+
+        available = self._get_available_quantities(products, locations)
+        shortages = [
+            _("%(product)s: required %(required)s %(uom)s, available %(available)s",
+              product=product.display_name, required=quantity, uom=product.uom_id.name,
+              available=available.get(product.id, 0.0))
+            for product, quantity in requirements.items()
+            if float_compare(available.get(product.id, 0.0), quantity, precision_rounding=product.uom_id.rounding) < 0
+        ]
+        if shortages:
+            raise UserError(_("Not enough stock in the pharmacy:\n%s", "\n".join(shortages)))
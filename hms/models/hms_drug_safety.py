@@ -0,0 +1,73 @@
+from collections import namedtuple
+
+from odoo import models, api, tools
+from odoo.tools import SQL
+
+# Hit levels, from the most to the least severe.
+CONTRAINDICATION = 'contraindication'
+CAUTION = 'caution'
+INTERACTION = 'interaction'
+
+# Safety rules of a medicine: frozensets of hms.disease / product.product ids.
+SafetyProfile = namedtuple('SafetyProfile', 'danger_disease_ids caution_disease_ids interfering_medication_ids')
+EMPTY_PROFILE = SafetyProfile(frozenset(), frozenset(), frozenset())
+
+# ``key`` is whatever the caller uses to find the checked line back.
+SafetyHit = namedtuple('SafetyHit', 'key product_id level conflict_ids')
+
+# product.template field of every profile entry, in SafetyProfile order.
+PROFILE_FIELDS = ('danger_disease_ids', 'cautiuse_disease_ids', 'interfering_medication_ids')
+
+
+class HmsDrugSafety(models.AbstractModel):
+    """Check medicines against the diseases and medications of patients.
+
+    The safety rules of all medicines are loaded once per registry in a
+    ``{product.template id: SafetyProfile}`` map, cleared by the writes on
+    the rules of ``product.template``.
+    """
+    _name = 'hms.drug.safety'
+    _description = 'HMS Drug Safety'
+
+    @api.model
+    @tools.ormcache()
+    def _get_safety_map(self):
+        Template = self.env['product.template']
+        Template.flush_model(PROFILE_FIELDS)
+        rules = {}
+        for position, field_name in enumerate(PROFILE_FIELDS):
+            field = Template._fields[field_name]
+            self.env.cr.execute(SQL(
+                "SELECT %s, array_agg(%s) FROM %s GROUP BY 1",
+                SQL.identifier(field.column1),
+                SQL.identifier(field.column2),
+                SQL.identifier(field.relation),
+            ))
+            for template_id, ids in self.env.cr.fetchall():
+                rules.setdefault(template_id, [frozenset()] * len(PROFILE_FIELDS))[position] = frozenset(ids)
+        return {template_id: SafetyProfile(*profile) for template_id, profile in rules.items()}
+
+    @api.model
+    def _find_hits(self, checks):
+        """Match medicines against patient profiles in a single pass.
+
+        :param checks: iterable of ``(key, product_id, disease_ids, medication_ids)``
+            where the ids are those of the patient
+        :return: list of ``SafetyHit``, in the order of ``checks``
+        """
+        checks = list(checks)
+        safety_map = self._get_safety_map()
+        products = self.env['product.product'].sudo().browse({check[1] for check in checks if check[1]})
+        template_ids = {product.id: product.product_tmpl_id.id for product in products}
+        hits = []
+        for key, product_id, disease_ids, medication_ids in checks:
+            profile = safety_map.get(template_ids.get(product_id), EMPTY_PROFILE)
+            for level, rule, patient_ids in (
+                (CONTRAINDICATION, profile.danger_disease_ids, disease_ids),
+                (CAUTION, profile.caution_disease_ids, disease_ids),
+                (INTERACTION, profile.interfering_medication_ids, medication_ids),
+            ):
+                conflict_ids = rule.intersection(patient_ids)
+                if conflict_ids:
+                    hits.append(SafetyHit(key, product_id, level, sorted(conflict_ids)))
+        return hits
@@ -6,9 +6,14 @@ import logging
 class HmsLabRequest(models.Model):
     _name = 'hms.lab.request'
     _description = 'HMS Lab Request'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hms.dashboard.cache.mixin', 'hms.stats.mixin', 'hms.notification.mixin', 'hms.cost.document.mixin']
+    _cost_line_field = 'lab_request_line_ids'
+    _stats_fields = ('date_requested', 'case_id')
+    _dashboard_cache_fields = ('state', 'date_requested', 'case_id')
     _rec_name = 'name'
 
+    _state_date_requested_idx = models.Index("(state, date_requested)")
+
     name = fields.Char(string='Name', required=True, default='New')
     lab_request_line_ids = fields.One2many('hms.lab.request.line', 'lab_request_id', string="Lab Request Lines")
     lab_result_ids = fields.One2many(
@@ -52,13 +57,23 @@ class HmsLabRequest(models.Model):
                 record.name = f"{sequence}/{record.patient_id.name}"
             else:
                 record.name = sequence
-        lab = self.env['hr.employee'].search([('hms_role_id.name', '=', 'Lab Attendant')])
-        for lab_tech in lab:
-            record.send_inbox_notification(lab_tech.user_id, _("Lab request %s for case %s needs review.") % (record.name, record.case_id.name), fields.Datetime.now() + timedelta(days=1))
+        self.env['hms.notification']._send([{
+            'record': record,
+            'roles': ['lab_attendant'],
+            'message': _("Lab request %s for case %s needs review.") % (record.name, record.case_id.name),
+            'date_deadline': fields.Datetime.now() + timedelta(days=1),
+        }])
 
         return record
 
 
+    def _dashboard_cache_targets(self):
+        staff = self.case_id.main_doctor_id | self.case_id.nurse_id
+        return {
+            'dashboard': (staff.user_id.ids, ('lab',)),
+            'chart': ((), ('lab',)),
+        }
+
     @api.depends('lab_request_line_ids.lab_result_ids')
     def _compute_lab_results(self):
         for request in self:
@@ -68,16 +83,13 @@ class HmsLabRequest(models.Model):
         for record in self:
             if record.state != 'draft':
                 raise UserError(_("Only draft requests can be confirmed."))
-            record.state = 'requested'
-            for line in record.lab_request_line_ids:
-                    line_vals = {
-                        'order_id': record.case_id.sale_order_id.id,
-                        'product_id': line.product_id.id,
-                        'product_uom_qty': 1,
-                        'price_unit': line.product_id.list_price,
-                    }
-
-                    self.env['sale.order.line'].create(line_vals)
+        self.state = 'requested'
+        Billing = self.env['hms.billing']
+        Billing._add_order_lines([
+            Billing._prepare_line(record.case_id.sale_order_id, line.product_id)
+            for record in self
+            for line in record.lab_request_line_ids
+        ])
 
     def action_start(self):
         for record in self:
@@ -86,27 +98,18 @@ class HmsLabRequest(models.Model):
             record.state = 'in_progress'
 
     def action_done(self):
-        StockMove = self.env['stock.move'].sudo()
         for record in self:
             if record.state != 'in_progress':
                 raise UserError(_("Only in-progress requests can be marked as Completed."))
-            record.state = 'completed'
-            location = self.env.ref('stock.stock_location_stock')
-            for line in record.lab_request_line_ids:
-                available_qty = self.env['stock.quant']._get_available_quantity(
-                    line.product_id, location
-                )
-                if available_qty < 1:
-                    raise UserError(_("Not enough stock for %s. Available: %s %s") %
-                                    (line.product_id.name, available_qty, line.uom_id.name))
-            try:
-                sale_order = record.case_id.sale_order_id
-                for picking in sale_order.picking_ids:
-                    picking.button_validate()   
-               
-            except Exception as e:
-                raise UserError(_("Error while dispensing test: %s") % str(e))
-
+        # Check the pharmacy stock of all the requests at once
+        Dispensing = self.env['hms.dispensing']
+        Dispensing._check_and_lock(Dispensing._get_requirements(lab_requests=self))
+        self.state = 'completed'
+        try:
+            self.env['hms.billing']._validate_pickings(self.case_id.sale_order_id)
+        except Exception as e:
+            raise UserError(_("Error while dispensing test: %s") % str(e))
+        for record in self:
             record.send_inbox_notification(record.requested_by_id.user_id, _("Lab request %s for case %s has been completed.") % (record.name, record.case_id.name), fields.Datetime.now())
 
     def action_cancel(self):
@@ -115,18 +118,3 @@ class HmsLabRequest(models.Model):
                 raise UserError(_("You cannot cancel a completed request."))
             record.state = 'cancelled'
     
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                summary=_("Hospital Notification"),
-                note=f"<div>{message_body}",
-                user_id=user_id.id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
\ No newline at end of file
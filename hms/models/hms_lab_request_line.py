@@ -3,9 +3,15 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from odoo.exceptions import ValidationError
 
+NORMAL_RANGE_PATTERN = re.compile(r'^\s*[\d.]+\s*-\s*[\d.]+\s*$')
+
 class HmsLabRequestLine(models.Model):
     _name = 'hms.lab.request.line'
     _description = _('HMS Lab Request Line')
+    _inherit = ['hms.cost.line.mixin']
+    _cost_category = 'lab'
+    _cost_case_field = 'lab_request_id.case_id'
+    _cost_fields = ('product_id', 'lab_request_id')
 
     name = fields.Char(string=_('Name'), required=True, default='New')
     lab_request_id = fields.Many2one('hms.lab.request', string=_('Lab Request'), required=True, ondelete='cascade')
@@ -61,63 +67,78 @@ class HmsLabRequestLine(models.Model):
                 'warning': warning
             }
 
+    @api.model
+    def _get_value_error(self, value):
+        """Return why ``value`` is not a valid result, or None."""
+        if not value:
+            return None
+        try:
+            if float(value) < 0:
+                return _("The entered value cannot be negative.")
+        except ValueError:
+            return _("You must enter a valid numeric value in the 'value' field.")
+        return None
+
+    @api.model
+    def _get_normal_range_error(self, normal_range):
+        """Return why ``normal_range`` is not a valid ``min - max`` range, or None."""
+        if not normal_range:
+            return None
+        # Use regular expression to allow only numeric values and one dash
+        if not NORMAL_RANGE_PATTERN.match(normal_range):
+            return _("Normal range must only contain numbers and a single dash (e.g. '3.5 - 7.2'). Letters or other characters are not allowed.")
+
+        # Try to convert both sides to float and validate logical order
+        try:
+            parts = normal_range.split('-')
+            min_val = float(parts[0].strip())
+            max_val = float(parts[1].strip())
+            if min_val >= max_val:
+                return _("Minimum value must be less than maximum value in normal range.")
+        except ValueError:
+            return _("Both values in normal range must be valid numbers.")
+        return None
+
+    @staticmethod
+    def _is_abnormal_value(value, normal_range):
+        if not value or not normal_range:
+            return False
+        try:
+            value_float = float(value)
+
+            # Try to parse normal_range if formatted as 'min - max'
+            if '-' in normal_range:
+                parts = normal_range.split('-')
+                if len(parts) == 2:
+                    min_val = float(parts[0].strip())
+                    max_val = float(parts[1].strip())
+                    return not (min_val <= value_float <= max_val)
+                return False
+            # Handle fixed normal value (less commonly used)
+            normal_val = float(normal_range.strip())
+            tolerance = normal_val * 0.1
+            return abs(value_float - normal_val) > tolerance
+        except (ValueError, TypeError):
+            return False
+
     @api.constrains('value')
     def _check_value_is_numeric_and_positive(self):
         for record in self:
-            if record.value:
-                try:
-                    value_float = float(record.value)
-                    if value_float < 0:
-                        raise ValidationError(_("The entered value cannot be negative."))
-                except ValueError:
-                    raise ValidationError(_("You must enter a valid numeric value in the 'value' field."))
+            error = self._get_value_error(record.value)
+            if error:
+                raise ValidationError(error)
 
     @api.constrains('normal_range')
     def _check_normal_range_format(self):
         for record in self:
-            if record.normal_range:
-                # Use regular expression to allow only numeric values and one dash
-                pattern = r'^\s*[\d.]+\s*-\s*[\d.]+\s*$'
-                if not re.match(pattern, record.normal_range):
-                    raise ValidationError(_("Normal range must only contain numbers and a single dash (e.g. '3.5 - 7.2'). Letters or other characters are not allowed."))
-
-                # Try to convert both sides to float and validate logical order
-                try:
-                    parts = record.normal_range.split('-')
-                    min_val = float(parts[0].strip())
-                    max_val = float(parts[1].strip())
-                    if min_val >= max_val:
-                        raise ValidationError(_("Minimum value must be less than maximum value in normal range."))
-                except ValueError:
-                    raise ValidationError(_("Both values in normal range must be valid numbers."))
+            error = self._get_normal_range_error(record.normal_range)
+            if error:
+                raise ValidationError(error)
 
     @api.depends('value', 'normal_range')
     def _compute_is_abnormal(self):
         for record in self:
-            record.is_abnormal = False
-            if record.value and record.normal_range:
-                try:
-                    value_float = float(record.value)
-
-                    # Try to parse normal_range if formatted as 'min - max'
-                    if '-' in record.normal_range:
-                        parts = record.normal_range.split('-')
-                        if len(parts) == 2:
-                            min_val = float(parts[0].strip())
-                            max_val = float(parts[1].strip())
-                            record.is_abnormal = not (min_val <= value_float <= max_val)
-                        else:
-                            record.is_abnormal = False
-                    else:
-                        # Handle fixed normal value (less commonly used)
-                        try:
-                            normal_val = float(record.normal_range.strip())
-                            tolerance = normal_val * 0.1
-                            record.is_abnormal = abs(value_float - normal_val) > tolerance
-                        except ValueError:
-                            record.is_abnormal = False
-                except (ValueError, TypeError):
-                    record.is_abnormal = False
+            record.is_abnormal = self._is_abnormal_value(record.value, record.normal_range)
 
 
     @api.model
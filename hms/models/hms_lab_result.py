@@ -1,17 +1,20 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 class HmsLabResult(models.Model):
     _name = 'hms.lab.result'
     _description = _('HMS Lab Result')
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hms.stats.mixin', 'hms.dashboard.cache.mixin']
+    _stats_fields = ('case_id',)
+    _dashboard_cache_fields = ('case_id', 'lab_request_line_id')
     _rec_name = 'name'
 
     name = fields.Char(string=_('Name'), required=True, default='New')
     case_id = fields.Many2one('hms.case', string=_('Case'), required=True)
     lab_request_line_id = fields.Many2one('hms.lab.request.line',string=_('Lab Test'),domain="[('lab_request_id.case_id', '=', case_id)]",required=True)
     lab_request_id = fields.Many2one('hms.lab.request',string=_('Lab Request'),compute='_compute_lab_request_and_patient',store=True)
-    patient_id = fields.Many2one('res.partner', string='Patient', related='case_id.patient_id', store=True)
+    patient_id = fields.Many2one('res.partner', string='Patient', related='case_id.patient_id', store=True, index=True)
     date_result = fields.Datetime(string=_('Result Date'), default=fields.Datetime.now, required=True)
     lab_technician_id = fields.Many2one('hr.employee', string=_('Lab Technician'), related='lab_request_id.lab_technician_id', store=True)
     lab_request_state = fields.Selection(related='lab_request_id.state', string=_('Lab Request State'), store=True)
@@ -23,19 +26,43 @@ class HmsLabResult(models.Model):
     def print_lab_result_report(self):
         return self.env.ref('hms.report_lab_result_document').report_action(self) 
 
+    def _dashboard_cache_targets(self):
+        staff = self.case_id.main_doctor_id | self.case_id.nurse_id
+        return {'dashboard': (staff.user_id.ids, ('lab',))}
 
-    @api.model
-    def create(self, vals):
-        record = super(HmsLabResult, self).create(vals)
 
-        if record.name == 'New':
-            sequence = self.env['ir.sequence'].next_by_code('hms.lab.result') or 'New'
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+
+        unnamed = records.filtered(lambda r: r.name == 'New')
+        for record, sequence in zip(unnamed, self._next_sequence_numbers(len(unnamed))):
             if record.patient_id:
                 record.name = f"{sequence}/{record.patient_id.name}"
             else:
                 record.name = sequence
 
-        return record
+        return records
+
+    @api.model
+    def _next_sequence_numbers(self, count):
+        """Draw ``count`` numbers of the lab result sequence at once."""
+        if not count:
+            return []
+        sequence = self.env['ir.sequence'].sudo().search([
+            ('code', '=', 'hms.lab.result'),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+        if not sequence:
+            return ['New'] * count
+        if sequence.implementation != 'standard' or sequence.use_date_range:
+            # no-gap and date range sequences hand out one number at a time
+            return [sequence._next() for _i in range(count)]
+        self.env.cr.execute(SQL(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            f'ir_sequence_{sequence.id:03d}', count,
+        ))
+        return [sequence.get_next_char(number) for number, in self.env.cr.fetchall()]
 
 
     @api.depends('lab_request_line_id')
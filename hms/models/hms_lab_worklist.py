@@ -0,0 +1,159 @@
+import csv
+import io
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+# Lab requests accepting results.
+OPEN_STATES = ('requested', 'in_progress')
+CSV_COLUMNS = ('line_id', 'value', 'normal_range', 'recommendations')
+
+
+class HmsLabWorklist(models.AbstractModel):
+    """Pending lab tests and bulk result entry for technicians and analysers.
+
+    A submitted result is a dict with the keys ``line_id`` (hms.lab.request.line),
+    ``value`` and optionally ``normal_range`` and ``recommendations``.
+    """
+    _name = 'hms.lab.worklist'
+    _description = 'HMS Lab Worklist'
+
+    @api.model
+    def get_worklist(self, limit=500):
+        """Return the tests of open requests still waiting for a value, most urgent first.
+
+        The ordering is done in SQL before the limit, so urgent tests are
+        never cut off by older normal ones.
+        """
+        Line = self.env['hms.lab.request.line']
+        query = Line._search([
+            ('lab_request_id.state', 'in', OPEN_STATES),
+            ('value', '=', False),
+        ])
+        self.env['hms.lab.request'].flush_model(['urgency', 'date_requested'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT l.id
+              FROM hms_lab_request_line l
+              JOIN hms_lab_request r ON r.id = l.lab_request_id
+             WHERE l.id IN (%s)
+             ORDER BY r.urgency = 'urgent' DESC, r.date_requested, l.id
+             LIMIT %s
+            """,
+            query.subselect(), limit,
+        ))
+        lines = Line.browse([line_id for line_id, in self.env.cr.fetchall()])
+        return [{
+            'line_id': line.id,
+            'request': line.lab_request_id.name,
+            'urgency': line.lab_request_id.urgency,
+            'patient': line.lab_request_id.patient_id.name,
+            'test': line.product_id.display_name,
+            'normal_range': line.normal_range or '',
+        } for line in lines]
+
+    @api.model
+    def submit_csv(self, data, raise_on_error=True):
+        """Submit results from CSV text with a header row, see ``CSV_COLUMNS``."""
+        reader = csv.DictReader(io.StringIO(data))
+        missing = {'line_id', 'value'} - set(reader.fieldnames or ())
+        if missing:
+            raise UserError(_("Missing CSV columns: %s", ", ".join(sorted(missing))))
+        return self.submit_results(
+            [{key: row.get(key) for key in CSV_COLUMNS if row.get(key) not in (None, '')} for row in reader],
+            raise_on_error=raise_on_error,
+        )
+
+    @api.model
+    def submit_results(self, results, raise_on_error=True):
+        """Record the values of many lab tests at once.
+
+        All the entries are validated first. The values, normal ranges and
+        abnormal flags are then written in one query. The hms.lab.result rows
+        are created in one batch, and the cases are flagged with new results
+        in one write.
+
+        :param raise_on_error: raise listing every invalid entry, otherwise
+            skip them and report them in ``errors``
+        :return: dict with the created ``result_ids``, the ``abnormal_line_ids``
+            and the ``errors`` as ``{'line_id', 'error'}`` dicts
+        """
+        Line = self.env['hms.lab.request.line']
+        Line.check_access('write')
+        line_ids = set()
+        for entry in results:
+            try:
+                line_ids.add(int(entry['line_id']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        lines_by_id = {line.id: line for line in Line.browse(line_ids).exists()}
+
+        errors, accepted = [], []
+        seen = set()
+        for entry in results:
+            line_id = entry.get('line_id')
+            try:
+                line = lines_by_id.get(int(line_id))
+            except (TypeError, ValueError):
+                line = None
+            value = str(entry.get('value') or '').strip()
+            normal_range = str(entry.get('normal_range') or '').strip() or (line.normal_range if line else False)
+            if not line:
+                error = _("Unknown lab test.")
+            elif line.id in seen:
+                error = _("Submitted more than once.")
+            elif line.lab_request_id.state not in OPEN_STATES:
+                error = _("Lab request %s does not accept results.", line.lab_request_id.name)
+            elif not value:
+                error = _("A value is required.")
+            else:
+                error = Line._get_value_error(value) or Line._get_normal_range_error(normal_range)
+            if error:
+                errors.append({'line_id': line_id, 'error': error})
+                continue
+            seen.add(line.id)
+            accepted.append((line, value, normal_range or None, Line._is_abnormal_value(value, normal_range), entry))
+
+        if errors and raise_on_error:
+            raise UserError(_("Invalid lab results:\n%s", "\n".join(
+                "%s: %s" % (error['line_id'], error['error']) for error in errors
+            )))
+        if not accepted:
+            return {'result_ids': [], 'abnormal_line_ids': [], 'errors': errors}
+
+        lines = Line.browse([line.id for line, *_rest in accepted])
+        # the raw UPDATE below bypasses write(), check the record rules here
+        lines.check_access('write')
+        lines.flush_recordset()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE hms_lab_request_line l
+               SET value = v.value, normal_range = v.normal_range, is_abnormal = v.is_abnormal,
+                   write_uid = %s, write_date = %s
+              FROM (VALUES %s) AS v(id, value, normal_range, is_abnormal)
+             WHERE l.id = v.id
+            """,
+            self.env.uid, fields.Datetime.now(),
+            SQL(", ").join(
+                SQL("(%s, %s, %s, %s)", line.id, value, normal_range, is_abnormal)
+                for line, value, normal_range, is_abnormal, _entry in accepted
+            ),
+        ))
+        lines.invalidate_recordset(['value', 'normal_range', 'is_abnormal', 'write_uid', 'write_date'])
+        lines.modified(['value', 'normal_range', 'is_abnormal'])
+
+        now = fields.Datetime.now()
+        results = self.env['hms.lab.result'].create([{
+            'case_id': line.lab_request_id.case_id.id,
+            'lab_request_line_id': line.id,
+            'date_result': now,
+            'recommendations': entry.get('recommendations'),
+        } for line, _value, _range, _abnormal, entry in accepted])
+        lines.lab_request_id.case_id.sudo().write({'new_results': True})
+
+        return {
+            'result_ids': results.ids,
+            'abnormal_line_ids': [line.id for line, _value, _range, is_abnormal, _entry in accepted if is_abnormal],
+            'errors': errors,
+        }
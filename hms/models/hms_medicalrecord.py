@@ -1,4 +1,6 @@
 from odoo import models, fields, api
+
+from .hms_counter import init_counter
 class HmsMedicalRecord(models.Model):
     _name = 'hms.medical.record'
     _description = "Patient's Medical Record"
@@ -16,6 +18,7 @@ class HmsMedicalRecord(models.Model):
     allergies = fields.Text(string='Allergies')
     disease_ids = fields.Many2many('hms.disease', string='Known Diseases')
     case_ids = fields.One2many('hms.case', 'medical_record_id', string='Cases')
+    case_sequence = fields.Integer(string='Last Case Number', readonly=True, copy=False)
     notes = fields.Html(string='Notes')
     patient_phone = fields.Char(related="patient_id.phone", string="Phone", store=True)
     patient_email = fields.Char(related="patient_id.email", string="Email", store=True)
@@ -25,6 +28,9 @@ class HmsMedicalRecord(models.Model):
         ('unique_patient_record', 'unique(patient_id)', 'Each patient can only have one medical record!')
     ]
 
+    def init(self):
+        init_counter(self.env.cr, self._table, 'case_sequence', 'hms_case', 'medical_record_id')
+
     @api.model
     def create(self, vals):
         recs = super(HmsMedicalRecord, self).create(vals)
@@ -7,6 +7,8 @@ class MedicalNote(models.Model):
     _description = 'Medical Note'
     _order = 'create_date desc'
 
+    _case_note_type_idx = models.Index("(case_id, note_type)")
+
     name= fields.Char(string="Title", required=True, default="New")
 
     case_id = fields.Many2one('hms.case', string="Case")
@@ -110,24 +112,8 @@ class MedicalNote(models.Model):
             if note_entry:
                 record._append_note(note_entry)
 
-            # send notifications if important
-            if record.is_important and record.case_id:
-                doctor_user = record.case_id.main_doctor_id.user_id
-                nurse_user = record.case_id.nurse_id.user_id
-
-                msg = f"Important {record.note_type} note added by {record.role}.{record.user_id.name} : {record.note}"
-
-                record.send_inbox_notification(
-                    doctor_user,
-                    msg,
-                    fields.Datetime.now() + timedelta(minutes=30),
-                )
-                record.send_inbox_notification(
-                    nurse_user,
-                    msg,
-                    fields.Datetime.now() + timedelta(minutes=30),
-                )
-
+        # send notifications if important
+        records._notify_important()
         return records
 
     def write(self, vals):
@@ -136,11 +122,18 @@ class MedicalNote(models.Model):
         if note_entry:
             for rec in self:
                 rec._append_note(note_entry)
-                if rec.is_important and rec.case_id:
-                    rec.send_inbox_notification(rec.case_id.main_doctor_id.user_id, f"Important {rec.note_type} note added by {rec.role}.{rec.user_id.name} : {rec.note}", fields.Datetime.now + timedelta(minutes=30))
-                    rec.send_inbox_notification(rec.case_id.nurse_id.user_id, f"Important {rec.note_type} note added by {rec.role}.{rec.user_id.name} : {rec.note}", fields.Datetime.now + timedelta(minutes=30))
+            self._notify_important()
         return res
 
+    def _notify_important(self):
+        """Notify the doctor and nurses of the case about important notes, on the case itself."""
+        self.env['hms.notification']._send([{
+            'record': rec.case_id,
+            'user_ids': (rec.case_id.main_doctor_id.user_id | rec.case_id.nurse_id.user_id).ids,
+            'message': f"Important {rec.note_type} note added by {rec.role}.{rec.user_id.name} : {rec.note}",
+            'date_deadline': fields.Datetime.now() + timedelta(minutes=30),
+        } for rec in self if rec.is_important and rec.case_id])
+
     def _append_note(self, entry_text):
         """Append new entry to accumulated note with author, role, timestamp."""
         entry_text = entry_text.strip()
@@ -152,20 +145,3 @@ class MedicalNote(models.Model):
         self.note_acc = (self.note_acc or "") + new_content
         self.note = False  
     
-
-
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                summary=_("Hospital Notification"),
-                note=f"<div>{message_body}",
-                user_id=user_id.id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
\ No newline at end of file
@@ -0,0 +1,120 @@
+import logging
+
+from markupsafe import Markup
+
+from odoo import models, api, _
+
+_logger = logging.getLogger(__name__)
+
+
+class HmsNotification(models.AbstractModel):
+    """Schedule hospital notices as To-Do activities of their recipients.
+
+    A notice is a dict with the keys:
+
+    * ``record``: the document the activity is attached to
+    * ``user_ids``: ids of the recipients
+    * ``roles``: HMS role codes (or names) whose employees also receive the notice
+    * ``message``: plain text of the notice
+    * ``date_deadline``: deadline of the activity
+    """
+    _name = 'hms.notification'
+    _description = 'HMS Notification Service'
+
+    @api.model
+    def _get_role_user_ids(self, role_codes):
+        """Return ``{role_code: user_ids}`` of the employees having these roles."""
+        Role = self.env['hms.role']
+        return {code: set(Role.get_users(code).ids) for code in role_codes}
+
+    @api.model
+    def _send(self, notices, digest=False):
+        """Create the activities of all ``notices`` in one batch.
+
+        With ``digest``, the notices of one user on one record are merged in
+        a single activity, and appended to the open hospital notification of
+        that user on that record if there is one.
+        """
+        notices = list(notices)
+        roles = {code for notice in notices for code in notice.get('roles', ())}
+        role_user_ids = self._get_role_user_ids(roles) if roles else {}
+
+        # (res_model, res_id, user_id) -> [messages, deadline]
+        pending = {}
+        entries = []
+        for notice in notices:
+            record = notice['record']
+            if not record:
+                continue
+            user_ids = set(notice.get('user_ids', ()))
+            for code in notice.get('roles', ()):
+                user_ids |= role_user_ids.get(code, set())
+            for user_id in user_ids:
+                if not user_id:
+                    continue
+                key = (record._name, record.id, user_id)
+                if digest and key in pending:
+                    pending[key][0].append(notice['message'])
+                    pending[key][1] = min(pending[key][1], notice['date_deadline'])
+                else:
+                    entry = [[notice['message']], notice['date_deadline']]
+                    pending[key] = entry
+                    entries.append((key, entry))
+        if not entries:
+            return self.env['mail.activity']
+
+        Activity = self.env['mail.activity'].sudo()
+        activity_type = self.env.ref('mail.mail_activity_data_todo', raise_if_not_found=False)
+        summary = _("Hospital Notification")
+        existing = {}
+        if digest:
+            for activity in Activity.search([
+                ('res_model', 'in', list({key[0] for key, _entry in entries})),
+                ('res_id', 'in', list({key[1] for key, _entry in entries})),
+                ('user_id', 'in', list({key[2] for key, _entry in entries})),
+                ('summary', '=', summary),
+            ]):
+                existing.setdefault((activity.res_model, activity.res_id, activity.user_id.id), activity)
+
+        vals_list = []
+        model_ids = {}
+        try:
+            with self.env.cr.savepoint():
+                for (res_model, res_id, user_id), (messages, date_deadline) in entries:
+                    note = Markup().join(Markup('<div>%s</div>') % message for message in messages)
+                    activity = existing.get((res_model, res_id, user_id))
+                    if activity:
+                        activity.note = (activity.note or Markup()) + note
+                        continue
+                    if res_model not in model_ids:
+                        model_ids[res_model] = self.env['ir.model']._get_id(res_model)
+                    vals_list.append({
+                        'res_model_id': model_ids[res_model],
+                        'res_id': res_id,
+                        'activity_type_id': activity_type.id if activity_type else False,
+                        'summary': summary,
+                        'note': note,
+                        'user_id': user_id,
+                        'date_deadline': date_deadline,
+                    })
+                return Activity.create(vals_list)
+        except Exception:
+            # don't raise on notification failures
+            _logger.exception("Failed to schedule %s hospital notifications", len(entries))
+            return self.env['mail.activity']
+
+
+class HmsNotificationMixin(models.AbstractModel):
+    _name = 'hms.notification.mixin'
+    _description = 'HMS Inbox Notifications'
+
+    def send_inbox_notification(self, user_id, message_body, date_deadline):
+        """Schedule a mail.activity for the users so they see it in their ToDos."""
+        if not user_id:
+            return
+        self.env['hms.notification']._send([{
+            'record': record,
+            'user_ids': user_id.ids,
+            'message': message_body,
+            'date_deadline': date_deadline,
+        } for record in self])
@@ -0,0 +1,145 @@
+from odoo import models, fields, api, _
+from odoo.tools import SQL
+
+# Queue priority of the prescription urgencies.
+URGENCY_PRIORITY = {'normal': 0, 'high': 1, 'urgent': 2}
+
+
+class HmsPharmacyQueue(models.Model):
+    """Prescriptions waiting to be dispensed, one row per prescription.
+
+    Chemists pull the next item with ``claim_next``; rows are locked with
+    ``SKIP LOCKED`` so concurrent claims never return the same prescription.
+    """
+    _name = 'hms.pharmacy.queue'
+    _description = 'HMS Pharmacy Queue'
+    _inherit = ['hms.dashboard.cache.mixin']
+    _order = 'priority desc, department_id, enqueue_date, id'
+    _rec_name = 'prescription_id'
+
+    _prescription_uniq = models.Constraint('UNIQUE(prescription_id)', "A prescription can only be queued once.")
+    _queued_idx = models.Index("(priority DESC, department_id, enqueue_date, id) WHERE state = 'queued'")
+
+    prescription_id = fields.Many2one('hms.prescription', string='Prescription', required=True, ondelete='cascade', readonly=True)
+    case_id = fields.Many2one(related='prescription_id.case_id', string='Case', store=True)
+    patient_id = fields.Many2one(related='prescription_id.patient_id', string='Patient')
+    department_id = fields.Many2one('hr.department', string='Ward', readonly=True)
+    priority = fields.Selection([
+        ('0', 'Normal'),
+        ('1', 'High'),
+        ('2', 'Urgent'),
+    ], string='Priority', default='0', required=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('claimed', 'Claimed'),
+        ('done', 'Done'),
+        ('cancelled', 'Cancelled'),
+    ], string='Status', default='queued', required=True, readonly=True)
+    enqueue_date = fields.Datetime(string='Queued On', default=fields.Datetime.now, required=True, readonly=True)
+    claim_date = fields.Datetime(string='Claimed On', readonly=True)
+    done_date = fields.Datetime(string='Done On', readonly=True)
+    user_id = fields.Many2one('res.users', string='Chemist', readonly=True)
+
+    def _dashboard_cache_targets(self):
+        return {'dashboard': ((), ('chemist',))}
+
+    @api.model
+    def _enqueue(self, prescriptions):
+        """Queue ``prescriptions``, re-queuing those already having a row."""
+        Queue = self.sudo()
+        existing = Queue.search([('prescription_id', 'in', prescriptions.ids)])
+        vals_by_prescription = {
+            prescription: {
+                'department_id': (prescription.case_id.bed_id.department_id or prescription.case_id.main_doctor_id.department_id).id,
+                'priority': str(URGENCY_PRIORITY.get(prescription.urgency, 0)),
+            }
+            for prescription in prescriptions
+        }
+        for row in existing:
+            row.write(dict(
+                vals_by_prescription.pop(row.prescription_id),
+                state='queued', enqueue_date=fields.Datetime.now(),
+                claim_date=False, done_date=False, user_id=False,
+            ))
+        return existing | Queue.create([
+            dict(vals, prescription_id=prescription.id)
+            for prescription, vals in vals_by_prescription.items()
+        ])
+
+    @api.model
+    def _close(self, prescriptions, state):
+        """Mark the rows of ``prescriptions`` done or cancelled."""
+        rows = self.sudo().search([('prescription_id', 'in', prescriptions.ids), ('state', 'in', ('queued', 'claimed'))])
+        rows.write({'state': state, 'done_date': fields.Datetime.now()})
+
+    @api.model
+    def claim_next(self, department_id=None):
+        """Assign the next queued prescription to the current user and open it.
+
+        :param department_id: optional ward to take the prescription from
+        """
+        domain = [('state', '=', 'queued')]
+        if department_id:
+            domain.append(('department_id', '=', int(department_id)))
+        # Same ordering as the list view (_order), the department rows joined
+        # for it are not locked.
+        query = self._search(domain, limit=1, order=self._order)
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "%s FOR UPDATE OF %s SKIP LOCKED",
+            query.select(SQL.identifier(self._table, 'id')),
+            SQL.identifier(self._table),
+        ))
+        row = self.browse([row_id for row_id, in self.env.cr.fetchall()])
+        if not row:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {'message': _("The pharmacy queue is empty."), 'type': 'info'},
+            }
+        row.write({'state': 'claimed', 'user_id': self.env.uid, 'claim_date': fields.Datetime.now()})
+        return row.action_open_prescription()
+
+    def action_release(self):
+        self.filtered(lambda r: r.state == 'claimed').write({
+            'state': 'queued', 'user_id': False, 'claim_date': False,
+        })
+
+    def action_open_prescription(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'hms.prescription',
+            'res_id': self.prescription_id.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    @api.model
+    def get_metrics(self):
+        """Queue depth and wait times, in minutes, in one query.
+
+        The claim wait is averaged over the items claimed in the last 24 hours.
+        """
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            """
+            SELECT count(*) FILTER (WHERE state = 'queued'),
+                   count(*) FILTER (WHERE state = 'claimed'),
+                   EXTRACT(EPOCH FROM avg(%(now)s - enqueue_date) FILTER (WHERE state = 'queued')) / 60,
+                   EXTRACT(EPOCH FROM max(%(now)s - enqueue_date) FILTER (WHERE state = 'queued')) / 60,
+                   EXTRACT(EPOCH FROM avg(claim_date - enqueue_date) FILTER (WHERE claim_date >= %(since)s)) / 60
+              FROM hms_pharmacy_queue
+             WHERE state IN ('queued', 'claimed') OR claim_date >= %(since)s
+            """,
+            now=fields.Datetime.now(),
+            since=fields.Datetime.subtract(fields.Datetime.now(), days=1),
+        ))
+        queued, claimed, avg_wait, max_wait, avg_claim_wait = self.env.cr.fetchone()
+        return {
+            'queued': queued,
+            'claimed': claimed,
+            'avg_wait': round(float(avg_wait or 0.0), 1),
+            'max_wait': round(float(max_wait or 0.0), 1),
+            'avg_claim_wait': round(float(avg_claim_wait or 0.0), 1),
+        }
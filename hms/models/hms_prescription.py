@@ -1,13 +1,20 @@
-from datetime import timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from .hms_drug_safety import CONTRAINDICATION, CAUTION, INTERACTION
 
 class HmsPrescription(models.Model):
     _name = 'hms.prescription'
     _description = _('HMS Prescription')
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hms.dashboard.cache.mixin', 'hms.stats.mixin', 'hms.notification.mixin', 'hms.cost.document.mixin']
+    _cost_line_field = 'prescription_line_ids'
+    _stats_fields = ('date', 'case_id')
+    _dashboard_cache_fields = ('state', 'date', 'case_id')
     _rec_name = 'name'
 
+    _state_date_idx = models.Index("(state, date)")
+
     name = fields.Char(string=_('Name'), required=True, default='New')
     case_id = fields.Many2one('hms.case', string=_('Case'), required=True)
     patient_id = fields.Many2one('res.partner', string=_('Patient'), related='case_id.patient_id', store=True)
@@ -18,6 +25,11 @@ class HmsPrescription(models.Model):
         ('dispensed', _('Dispensed')),
         ('cancelled', _('Cancelled'))
     ], string=_('State'), default='draft', required=True, tracking=True)
+    urgency = fields.Selection([
+        ('normal', _('Normal')),
+        ('high', _('High')),
+        ('urgent', _('Urgent'))
+    ], string=_('Urgency'), default='normal', required=True)
     prescription_line_ids = fields.One2many('hms.prescription.line', 'prescription_id', string=_('Prescription Lines'))
     is_dispensed = fields.Boolean(string=_('Is Dispensed'), store=True)
     notes = fields.Html(string='Notes')
@@ -28,66 +40,124 @@ class HmsPrescription(models.Model):
 )
     warning_message = fields.Text(string=_('Warning Message'), readonly=True)
 
-    def action_confirm(self):
-        for record in self:
-            record.state = 'confirmed'
-            cem = self.env['hr.employee'].sudo().search([('hms_role_id.code', '=', 'chemist')])
-            for chemist in cem:
-                record.send_inbox_notification(chemist.user_id, _("Prescription %s for case %s needs to be dispensed.") % (record.name, record.case_id.name), fields.Datetime.now() + timedelta(days=1))
-            for line in record.prescription_line_ids:
-                    line_vals = {
-                        'order_id': record.case_id.sale_order_id.id,
-                        'product_id': line.product_id.id,
-                        'product_uom_qty': line.quantity,
-                        'price_unit': line.product_id.list_price,
-                    }
+    def _dashboard_cache_targets(self):
+        return {
+            'dashboard': ((), ('chemist',)),
+            'chart': ((), ('chemist',)),
+        }
+
+    def get_safety_report(self):
+        """Check every line of the prescriptions against the medical record of their case.
+
+        The lines and the diseases and medications of the patients are read
+        in one query, then matched by ``hms.drug.safety`` in one pass.
+
+        :return: list of dicts with the keys ``prescription_id``, ``line_id``,
+            ``severity`` (contraindication, caution or interaction),
+            ``product_id``, ``product_name``, ``conflict_ids`` and ``reason``
+        """
+        if not self:
+            return []
+        self.check_access('read')
+        self.env.flush_all()
+        Record = self.env['hms.medical.record']
+        diseases = Record._fields['disease_ids']
+        medications = Record._fields['medication_ids']
+        self.env.cr.execute(SQL(
+            """
+            SELECT l.id, l.prescription_id, l.product_id,
+                   ARRAY(SELECT d.%(disease_id)s FROM %(disease_rel)s d WHERE d.%(disease_record_id)s = c.medical_record_id),
+                   ARRAY(SELECT m.%(medication_id)s FROM %(medication_rel)s m WHERE m.%(medication_record_id)s = c.medical_record_id)
+              FROM hms_prescription_line l
+              JOIN hms_prescription p ON p.id = l.prescription_id
+              JOIN hms_case c ON c.id = p.case_id
+             WHERE l.prescription_id = ANY(%(ids)s)
+             ORDER BY l.prescription_id, l.id
+            """,
+            disease_rel=SQL.identifier(diseases.relation),
+            disease_record_id=SQL.identifier(diseases.column1),
+            disease_id=SQL.identifier(diseases.column2),
+            medication_rel=SQL.identifier(medications.relation),
+            medication_record_id=SQL.identifier(medications.column1),
+            medication_id=SQL.identifier(medications.column2),
+            ids=self.ids,
+        ))
+        hits = self.env['hms.drug.safety']._find_hits(
+            ((prescription_id, line_id), product_id, disease_ids, medication_ids)
+            for line_id, prescription_id, product_id, disease_ids, medication_ids in self.env.cr.fetchall()
+        )
+
+        Product = self.env['product.product'].sudo()
+        Disease = self.env['hms.disease'].sudo()
+        # prefetch all the names at once
+        Product.browse({hit.product_id for hit in hits} | {i for hit in hits if hit.level == INTERACTION for i in hit.conflict_ids}).mapped('name')
+        Disease.browse({i for hit in hits if hit.level != INTERACTION for i in hit.conflict_ids}).mapped('name')
+        reasons = {
+            CONTRAINDICATION: _("Contraindicated for the patient's diseases: %s"),
+            CAUTION: _("Requires caution for the patient's diseases: %s"),
+            INTERACTION: _("May interfere with the patient's current medications: %s"),
+        }
+        report = []
+        for hit in hits:
+            conflicts = (Product if hit.level == INTERACTION else Disease).browse(hit.conflict_ids)
+            report.append({
+                'prescription_id': hit.key[0],
+                'line_id': hit.key[1],
+                'severity': hit.level,
+                'product_id': hit.product_id,
+                'product_name': Product.browse(hit.product_id).name,
+                'conflict_ids': hit.conflict_ids,
+                'reason': reasons[hit.level] % ", ".join(conflicts.mapped('name')),
+            })
+        return report
+
+    def _check_safety_before_confirm(self):
+        """Raise on contraindications, note the cautions and interactions on the prescriptions."""
+        report = self.get_safety_report()
+        dangers = [entry for entry in report if entry['severity'] == CONTRAINDICATION]
+        if dangers:
+            raise UserError("\n".join(
+                "%s - %s: %s" % (self.browse(entry['prescription_id']).name, entry['product_name'], entry['reason'])
+                for entry in dangers
+            ))
+        warnings = {}
+        for entry in report:
+            warnings.setdefault(entry['prescription_id'], []).append("%s: %s" % (entry['product_name'], entry['reason']))
+        for prescription in self:
+            if prescription.id in warnings:
+                prescription.warning_message = "\n".join(warnings[prescription.id])
 
-                    self.env['sale.order.line'].create(line_vals)
+    def action_confirm(self):
+        self._check_safety_before_confirm()
+        self.state = 'confirmed'
+        Billing = self.env['hms.billing']
+        Billing._add_order_lines([
+            Billing._prepare_line(record.case_id.sale_order_id, line.product_id, line.quantity)
+            for record in self
+            for line in record.prescription_line_ids
+        ])
+        # chemists pull the prescriptions from the pharmacy queue
+        self.env['hms.pharmacy.queue']._enqueue(self)
 
 
     def action_dispense(self):
-        StockMove = self.env['stock.move'].sudo()
+        # Check the pharmacy stock of all the prescriptions at once
+        Dispensing = self.env['hms.dispensing']
+        Dispensing._check_and_lock(Dispensing._get_requirements(prescriptions=self))
+        try:
+            picking_type = self.env.ref('stock.picking_type_out', raise_if_not_found=False)
+            if not picking_type:
+                raise UserError(_("Please configure a picking type for dispensing."))
+            self.env['hms.billing']._validate_pickings(self.case_id.sale_order_id)
+        except Exception as e:
+            raise UserError(_("Error while dispensing medication: %s") % str(e))
         for record in self:
-            # Get pharmacy location
-            pharmacy_location = self.env.ref('stock.stock_location_stock')
-
-            if not pharmacy_location:
-                # Fallback to any internal location if no pharmacy found
-                pharmacy_location = self.env['stock.location'].sudo().search(
-                    [('usage', '=', 'internal')],
-                    limit=1
-                )
-            if not pharmacy_location:
-                raise UserError(_("No pharmacy or internal location configured. Please configure a stock location first."))
-
-            # Check available quantity for all prescription lines before proceeding
-            for line in record.prescription_line_ids:
-                available_qty = self.env['stock.quant']._get_available_quantity(
-                    line.product_id, pharmacy_location
-                )
-                if available_qty < line.quantity:
-                    raise UserError(_("Not enough stock for %s. Available: %s %s") %
-                                    (line.product_id.name, available_qty, line.uom_id.name))
-
             # Proceed with dispensing
             try:
-                picking_type = self.env.ref('stock.picking_type_out', raise_if_not_found=False)
-                if not picking_type:
-                    raise UserError(_("Please configure a picking type for dispensing."))
-                sale_order = record.case_id.sale_order_id
-                for picking in sale_order.picking_ids:
-                    picking.button_validate()     
-
-
                 # Update prescription status
                 record.is_dispensed = True
                 record.state = 'dispensed'
 
-                # Send email notification
-                template = self.env.ref('hms.email_template_prescription_ready', raise_if_not_found=False)
-                if template:
-                    template.send_mail(record.id, force_send=True)
-
                 # Notify patient via portal if email exists
                 if record.patient_id.email:
                     self.env['mail.message'].create({
@@ -102,15 +172,23 @@ class HmsPrescription(models.Model):
             except Exception as e:
                 raise UserError(_("Error while dispensing medication: %s") % str(e))
 
+        # Queue the email notifications of all the prescriptions at once
+        template = self.env.ref('hms.email_template_prescription_ready', raise_if_not_found=False)
+        if template:
+            template.send_mail_batch(self.ids)
+
+        self.env['hms.pharmacy.queue']._close(self, 'done')
         return True
 
     def action_cancel(self):
         for record in self:
             record.state = 'cancelled'
+        self.env['hms.pharmacy.queue']._close(self, 'cancelled')
 
     def action_reset_to_draft(self):
         for record in self:
             record.state = 'draft'
+        self.env['hms.pharmacy.queue']._close(self, 'cancelled')
 
     def print_prescription_report(self):                                                                  
          return self.env.ref('hms.action_report_prescription').report_action(self) 
@@ -127,26 +205,8 @@ class HmsPrescription(models.Model):
                 record.name = f"{sequence}/{record.patient_id.name}"
             else:
                 record.name = sequence
-        cem = self.env['hr.employee'].search([('hms_role_id.code', '=', 'Chemist')])
-        for chemist in cem:
-            record.send_inbox_notification(chemist.user_id, _("Prescription %s for case %s needs to be validated.") % (record.name, record.case_id.name), fields.Datetime.now() + timedelta(days=1))
+        # chemists are only fed by the pharmacy queue, also for prescriptions created confirmed
+        if record.state == 'confirmed':
+            self.env['hms.pharmacy.queue']._enqueue(record)
 
         return record
-
-
-
-    def send_inbox_notification(self, user_id, message_body, date_deadline):
-        """Schedule a mail.activity for the user so doctor sees it in their ToDos."""
-        if not user_id:
-            return
-        try:
-            self.activity_schedule(
-                summary=_("Hospital Notification"),
-                note=f"<div>{message_body}",
-                user_id=user_id.id,
-                date_deadline=date_deadline,
-            )
-        except Exception:
-            # don't raise on notification failures
-            _logger = __import__('logging').getLogger(__name__)
-            _logger.exception("Failed to schedule activity for user %s", getattr(user_id, 'id', False))
\ No newline at end of file
@@ -1,10 +1,15 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from .hms_drug_safety import CONTRAINDICATION, CAUTION, INTERACTION
+
 class HmsPrescriptionLine(models.Model):
     _name = 'hms.prescription.line'
     _description = _('HMS Prescription Line')
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hms.cost.line.mixin']
+    _cost_category = 'pharmacy'
+    _cost_case_field = 'prescription_id.case_id'
+    _cost_fields = ('product_id', 'quantity', 'prescription_id')
 
     prescription_id = fields.Many2one(
         'hms.prescription', string=_('Prescription'), required=True, ondelete='cascade'
@@ -22,6 +27,9 @@ class HmsPrescriptionLine(models.Model):
     
     
 
+    def _cost_amount(self):
+        return self.product_id.list_price * self.quantity
+
     @api.onchange('product_id')
     def _onchange_product_id(self):
         if self.product_id:
@@ -35,19 +43,33 @@ class HmsPrescriptionLine(models.Model):
                 name += f" - {record.dosage}"
             result.append((record.id, name))
         return result
+
+    def _safety_checks(self):
+        """``(line, product_id, disease_ids, medication_ids)`` of the lines, for hms.drug.safety."""
+        return [(
+            line,
+            line.product_id.id,
+            line.prescription_id.case_id.medical_record_id.disease_ids.ids,
+            line.prescription_id.case_id.medical_record_id.medication_ids.ids,
+        ) for line in self]
+
+    def _safety_hit_names(self, hit):
+        model = 'product.product' if hit.level == INTERACTION else 'hms.disease'
+        return ", ".join(self.env[model].browse(hit.conflict_ids).mapped("name"))
+
     @api.onchange('product_id')
     def _onchange_product_diseases(self):
         if not self.product_id or not self.prescription_id:
             return
 
-        patient_diseases = self.prescription_id.case_id.medical_record_id.disease_ids
-        patient_medications = self.prescription_id.case_id.medical_record_id.medication_ids
+        hits = self.env['hms.drug.safety']._find_hits(self._safety_checks())
+        if not hits:
+            return
+        hit = hits[0]
+        names = self._safety_hit_names(hit)
 
         # 1. Danger = contraindicated → block selection
-        dangerous = self.product_id.danger_disease_ids
-        common_danger = dangerous & patient_diseases
-        if common_danger:
-            names = ", ".join(common_danger.mapped("name"))
+        if hit.level == CONTRAINDICATION:
             warning = {
                 'title': _("Contraindicated Medicine"),
                 'message': _("The medicine '%s' is contraindicated for diseases: %s.")
@@ -58,10 +80,7 @@ class HmsPrescriptionLine(models.Model):
             return {'warning': warning}
 
         # 2. Caution = show warning only
-        cautions = self.product_id.cautiuse_disease_ids
-        common_caution = cautions & patient_diseases
-        if common_caution:
-            names = ", ".join(common_caution.mapped("name"))
+        if hit.level == CAUTION:
             self.prescription_id.warning_message = _("Caution: The medicine '%s' requires caution for the patient's diseases: %s.") % (self.product_id.name, names)
 
             return {
@@ -72,37 +91,34 @@ class HmsPrescriptionLine(models.Model):
                 }
             }
         # 3. Interfering medications
-        interfering_meds = self.product_id.interfering_medication_ids
-        common_meds = interfering_meds & patient_medications
-        if common_meds:
-            names = ", ".join(common_meds.mapped("name"))
-            self.prescription_id.warning_message = _("Warning: The medicine '%s' may interfere with the patient's current medications: %s.") % (self.product_id.name, names)
+        self.prescription_id.warning_message = _("Warning: The medicine '%s' may interfere with the patient's current medications: %s.") % (self.product_id.name, names)
 
-            return {
-                'warning': {
-                    'title': _("Interfering Medications"),
-                    'message': _("The medicine '%s' may interfere with current medications: %s.")
-                            % (self.product_id.name, names)
-                }
+        return {
+            'warning': {
+                'title': _("Interfering Medications"),
+                'message': _("The medicine '%s' may interfere with current medications: %s.")
+                        % (self.product_id.name, names)
             }
+        }
+
     @api.constrains('product_id', 'prescription_id')
-    def _check_danger_diseases(self):
-        for record in self:
-            patient_diseases = record.prescription_id.case_id.medical_record_id.disease_ids
-            dangerous_diseases = record.product_id.danger_disease_ids
-            common_diseases = patient_diseases & dangerous_diseases
-            if common_diseases:
-                disease_names = ', '.join(common_diseases.mapped('name'))
-                raise UserError(_("Warning: The medicine '%s' is contraindicated for the patient's diseases: %s.") % (record.product_id.name, disease_names))
-    @api.constrains('product_id', 'prescription_id')
-    def _check_cautiuse_diseases(self):
-        for record in self:
-            patient_diseases = record.prescription_id.case_id.medical_record_id.disease_ids
-            cautiuse_diseases = record.product_id.cautiuse_disease_ids
-            common_diseases = patient_diseases & cautiuse_diseases
-            if common_diseases:
-                disease_names = ', '.join(common_diseases.mapped('name'))
-                record.prescription_id.warning_message = _("Caution: The medicine '%s' requires caution for the patient's diseases: %s.") % (record.product_id.name, disease_names)
+    def _check_safety(self):
+        """Block contraindicated medicines and note the cautions on the prescriptions, for all lines at once."""
+        hits = self.env['hms.drug.safety']._find_hits(self._safety_checks())
+        dangers = [
+            _("Warning: The medicine '%s' is contraindicated for the patient's diseases: %s.") % (hit.key.product_id.name, self._safety_hit_names(hit))
+            for hit in hits if hit.level == CONTRAINDICATION
+        ]
+        if dangers:
+            raise UserError("\n".join(dangers))
+        cautions = {}
+        for hit in hits:
+            if hit.level == CAUTION:
+                cautions.setdefault(hit.key.prescription_id, []).append(
+                    _("Caution: The medicine '%s' requires caution for the patient's diseases: %s.") % (hit.key.product_id.name, self._safety_hit_names(hit))
+                )
+        for prescription, messages in cautions.items():
+            prescription.warning_message = "\n".join(messages)
 
     @api.model
     def create(self, vals):
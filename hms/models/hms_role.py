@@ -1,4 +1,18 @@
-from odoo import models, fields
+from odoo import api, models, fields, tools
+
+# Capabilities and the groups granting them.
+CAPABILITY_GROUPS = {
+    'edit_diagnosis': ('hms.group_hms_doctor', 'base.group_system'),
+    'edit_labs': ('hms.group_hms_doctor', 'hms.group_hms_lab_attendant', 'hms.group_hms_nurse', 'base.group_system'),
+    'edit_consumables': ('hms.group_hms_nurse', 'base.group_system'),
+    'edit_prescriptions': ('hms.group_hms_doctor', 'hms.group_hms_chemist', 'base.group_system'),
+    'edit_team': ('hms.group_hms_receptionist', 'base.group_system'),
+    'edit_logistics': ('hms.group_hms_receptionist', 'hms.group_hms_doctor', 'base.group_system'),
+    'edit_facilities': ('hms.group_hms_receptionist',),
+    'edit_patients': ('hms.group_hms_receptionist', 'base.group_system'),
+}
+
+
 class HmsRole(models.Model):
     _name = "hms.role"
     _description = "Hospital System Role"
@@ -12,4 +26,79 @@ class HmsRole(models.Model):
     job_id = fields.Many2one(
         "hr.job", string="Job Position",
         help="Link to the job position associated with this role"
-    )
\ No newline at end of file
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        roles = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return roles
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'code', 'name', 'group_id'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    # ----------------------------
+    # Role directory
+    # ----------------------------
+    @staticmethod
+    def _normalize_role(role):
+        """'Lab Attendant', 'lab_attendant' and ' Lab attendant ' all give 'lab_attendant'."""
+        return '_'.join((role or '').lower().split())
+
+    @api.model
+    @tools.ormcache()
+    def _get_directory(self):
+        """Return ``{role: (employee_ids, user_ids)}`` keyed by normalized code and name.
+
+        Cleared whenever a role, or the role or user of an employee, changes.
+        """
+        members = {role.id: ([], []) for role in self.sudo().search([])}
+        for employee in self.env['hr.employee'].sudo().search([('hms_role_id', '!=', False)]):
+            employee_ids, user_ids = members[employee.hms_role_id.id]
+            employee_ids.append(employee.id)
+            if employee.user_id:
+                user_ids.append(employee.user_id.id)
+        directory = {}
+        for role in self.sudo().browse(members):
+            entry = tuple(tuple(ids) for ids in members[role.id])
+            directory.setdefault(self._normalize_role(role.name), entry)
+            directory[self._normalize_role(role.code)] = entry
+        return directory
+
+    @api.model
+    def get_employees(self, role):
+        """Employees having ``role``, given by code or name."""
+        employee_ids = self._get_directory().get(self._normalize_role(role), ((), ()))[0]
+        return self.env['hr.employee'].browse(employee_ids)
+
+    @api.model
+    def get_users(self, role):
+        """Users of the employees having ``role``, given by code or name."""
+        user_ids = self._get_directory().get(self._normalize_role(role), ((), ()))[1]
+        return self.env['res.users'].browse(user_ids)
+
+    # ----------------------------
+    # Capabilities
+    # ----------------------------
+    @api.model
+    def get_capabilities(self, user=None):
+        """Frozen set of the capabilities (keys of ``CAPABILITY_GROUPS``) of ``user``."""
+        return self._get_capabilities((user or self.env.user).id)
+
+    @api.model
+    @tools.ormcache('user_id')
+    def _get_capabilities(self, user_id):
+        # cleared by hms.role, res.groups and res.users writes on roles and group members
+        user = self.env['res.users'].sudo().browse(user_id)
+        return frozenset(
+            capability for capability, groups in CAPABILITY_GROUPS.items()
+            if any(user.has_group(group) for group in groups)
+        )
@@ -1,5 +1,7 @@
 from odoo import models, fields, api, _
 
+from .hms_counter import init_counter, reserve_numbers
+
 
 class HmsRoom(models.Model):
     _name = 'hms.room'
@@ -13,12 +15,13 @@ class HmsRoom(models.Model):
     # تُحسب تلقائياً من حالة الأسرة (لا حاجة لتعديلها يدوياً)
     is_occupied = fields.Boolean(
         string=_('Occupied'),
-        compute='_compute_is_occupied',
+        compute='_compute_bed_stats',
         store=True,
         readonly=True,
     )
 
     bed_ids = fields.One2many('hms.bed', 'room_id', string=_('Beds'))
+    bed_sequence = fields.Integer(string=_('Last Bed Number'), readonly=True, copy=False)
 
     can_edit = fields.Boolean(string='Can Edit', compute='_compute_can_edit', store=False)
 
@@ -27,7 +30,7 @@ class HmsRoom(models.Model):
     beds_total = fields.Integer(string=_('Beds (Total)'), compute='_compute_bed_stats', store=True)
     beds_occupied = fields.Integer(string=_('Beds (Occupied)'), compute='_compute_bed_stats', store=True)
     occupancy_rate = fields.Float(string=_('Occupancy (%)'), compute='_compute_bed_stats', store=True)
-    number_of_available_beds = fields.Integer(string=_('Beds (Available)'), compute='_compute_available_beds', store=True)
+    number_of_available_beds = fields.Integer(string=_('Beds (Available)'), compute='_compute_bed_stats', store=True)
     can_mark_out_of_service = fields.Boolean(
         string="Can Mark Out of Service",
         compute="_compute_can_mark_out_of_service",
@@ -38,33 +41,31 @@ class HmsRoom(models.Model):
         for room in self:
             room.can_mark_out_of_service = room.beds_occupied == 0
     @api.depends('bed_ids.state')
-    def _compute_available_beds(self):
-        for room in self:
-            room.number_of_available_beds = sum(1 for b in room.bed_ids if b.state == 'available')
-
-    @api.depends('bed_ids.state')
     def _compute_bed_stats(self):
         for room in self:
-            total = len(room.bed_ids)
-            occ = sum(1 for b in room.bed_ids if b.state == 'occupied')
+            states = room.bed_ids.mapped('state')
+            total = len(states)
+            occ = states.count('occupied')
             room.beds_total = total
             room.beds_occupied = occ
             room.occupancy_rate = (occ * 100.0 / total) if total else 0.0
-
-    @api.depends('bed_ids.state')
-    def _compute_is_occupied(self):
-        for room in self:
-            room.is_occupied = any(b.state == 'occupied' for b in room.bed_ids)
+            room.number_of_available_beds = states.count('available')
+            room.is_occupied = bool(occ)
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        for record in records:
-            if record.department_id:
-                total_rooms = self.search_count([("department_id", "=", record.department_id.id)])
-                record.name = f"{record.department_id.name} - Room {total_rooms}" or _("New Room")
-                record.display_name = f"{record.department_id.name} - Room {total_rooms}" or _("New Room")
+        rooms_by_department = records.filtered('department_id').grouped('department_id')
+        first_numbers = reserve_numbers(self.env, 'hr.department', 'hms_room_sequence', {
+            department.id: len(rooms) for department, rooms in rooms_by_department.items()
+        })
+        for department, rooms in rooms_by_department.items():
+            for number, room in enumerate(rooms, start=first_numbers[department.id]):
+                room.name = f"{department.name} - Room {number}"
         return records
 
+    def init(self):
+        init_counter(self.env.cr, self._table, 'bed_sequence', 'hms_bed', 'room_id')
+
 
     # <<< جديد: أزرار الواجهة >>>
     def action_mark_out_of_service(self):
@@ -78,6 +79,7 @@ class HmsRoom(models.Model):
         return True
 
     def _compute_can_edit(self):
+        can_edit = 'edit_facilities' in self.env['hms.role'].get_capabilities()
         for room in self:
-            room.can_edit = self.env.user.has_group('hms.group_hms_receptionist')
+            room.can_edit = can_edit
 
@@ -0,0 +1,358 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import models, fields, api
+from odoo.tools import SQL, create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+MEASURES = (
+    'patients_new', 'admissions', 'discharges', 'appointments',
+    'appointments_confirmed', 'prescriptions', 'lab_requests', 'lab_results',
+)
+
+class HmsStatsDaily(models.Model):
+    """Daily hospital KPIs per department and doctor.
+
+    Days are those of the hospital timezone, see ``_get_tz``. At commit time, the facts of the source records
+    changed by the transaction are counted again and the difference with
+    their facts before the change is added to the rows. The table is fully
+    rebuilt every night.
+    """
+    _name = 'hms.stats.daily'
+    _description = 'HMS Daily Statistics'
+    _order = 'date desc'
+
+    date = fields.Date(string='Date', required=True, index=True, readonly=True)
+    department_id = fields.Many2one('hr.department', string='Department', readonly=True)
+    doctor_id = fields.Many2one('hr.employee', string='Doctor', readonly=True)
+    patients_new = fields.Integer(string='New Patients', readonly=True)
+    admissions = fields.Integer(string='Admissions', readonly=True)
+    discharges = fields.Integer(string='Discharges', readonly=True)
+    appointments = fields.Integer(string='Appointments', readonly=True)
+    appointments_confirmed = fields.Integer(string='Confirmed Appointments', readonly=True)
+    prescriptions = fields.Integer(string='Prescriptions', readonly=True)
+    lab_requests = fields.Integer(string='Lab Requests', readonly=True)
+    lab_results = fields.Integer(string='Lab Results', readonly=True)
+
+    def init(self):
+        create_unique_index(
+            self.env.cr, 'hms_stats_daily_key_uniq', self._table,
+            ['date', 'COALESCE(department_id, 0)', 'COALESCE(doctor_id, 0)'],
+        )
+
+    @api.model
+    def _get_tz(self):
+        """Timezone of the statistics days: the one of the main company, or UTC.
+
+        It does not depend on the user, so every transaction buckets a record
+        on the same day.
+        """
+        company = self.env.ref('base.main_company', raise_if_not_found=False)
+        return (company and company.sudo().partner_id.tz) or 'UTC'
+
+    @api.model
+    def _day_start(self, day):
+        """Return the UTC datetime at which ``day`` starts in the hospital timezone."""
+        tz = pytz.timezone(self._get_tz())
+        return tz.localize(datetime.combine(day, time.min)).astimezone(pytz.utc).replace(tzinfo=None)
+
+    @api.model
+    def _facts_query(self, sources=None, window=None):
+        """One row per source record and counted measure.
+
+        The department comes from the appointment itself or from the main
+        doctor of the case.
+
+        :param sources: optional ``{table: ids}`` restricting the facts to
+            these records, the tables left out give no facts
+        :param window: optional ``(start, end)`` UTC datetimes restricting the
+            facts to the records dated in ``[start, end)``; date columns keep
+            the days touched by the window
+        """
+        tz = self._get_tz()
+
+        def only(table, alias):
+            if sources is None:
+                return SQL()
+            return SQL("AND %s.id = ANY(%s)", SQL.identifier(alias), list(sources[table]))
+
+        def day(column):
+            return SQL("(%s AT TIME ZONE 'UTC' AT TIME ZONE %s)::date", SQL(column), tz)
+
+        def dated(column, is_date=False):
+            if window is None:
+                return SQL("%s IS NOT NULL", SQL(column))
+            start, end = window
+            if is_date:
+                first, last = (
+                    pytz.utc.localize(value).astimezone(pytz.timezone(tz)).date()
+                    for value in (start, end - timedelta(microseconds=1))
+                )
+                return SQL("%s BETWEEN %s AND %s", SQL(column), first, last)
+            return SQL("%s >= %s AND %s < %s", SQL(column), start, SQL(column), end)
+
+        branches = {
+            'res_partner': SQL(
+                """
+                SELECT %s, NULL::int, NULL::int, 'patients_new'
+                  FROM res_partner rp
+                 WHERE rp.is_patient AND rp.active AND %s %s
+                """, day("rp.create_date"), dated("rp.create_date"), only('res_partner', 'rp')),
+            'hms_case': SQL(
+                """
+                SELECT %s, e.department_id, c.main_doctor_id, 'admissions'
+                  FROM hms_case c LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+                 WHERE %s %s
+                UNION ALL
+                SELECT %s, e.department_id, c.main_doctor_id, 'discharges'
+                  FROM hms_case c LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+                 WHERE %s %s
+                """,
+                day("c.admission_date"), dated("c.admission_date"), only('hms_case', 'c'),
+                day("c.discharge_date"), dated("c.discharge_date"), only('hms_case', 'c')),
+            'hms_appointment': SQL(
+                """
+                SELECT %s, COALESCE(a.department_id, e.department_id), a.doctor_id,
+                       unnest(CASE WHEN a.state = 'confirmed' THEN ARRAY['appointments', 'appointments_confirmed']
+                                   ELSE ARRAY['appointments'] END)
+                  FROM hms_appointment a LEFT JOIN hr_employee e ON e.id = a.doctor_id
+                 WHERE %s %s
+                """, day("a.date"), dated("a.date"), only('hms_appointment', 'a')),
+            'hms_prescription': SQL(
+                """
+                SELECT p.date, e.department_id, c.main_doctor_id, 'prescriptions'
+                  FROM hms_prescription p
+                  JOIN hms_case c ON c.id = p.case_id
+                  LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+                 WHERE %s %s
+                """, dated("p.date", is_date=True), only('hms_prescription', 'p')),
+            'hms_lab_request': SQL(
+                """
+                SELECT %s, e.department_id, c.main_doctor_id, 'lab_requests'
+                  FROM hms_lab_request q
+                  JOIN hms_case c ON c.id = q.case_id
+                  LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+                 WHERE %s %s
+                """, day("q.date_requested"), dated("q.date_requested"), only('hms_lab_request', 'q')),
+            'hms_lab_result': SQL(
+                """
+                SELECT %s, e.department_id, c.main_doctor_id, 'lab_results'
+                  FROM hms_lab_result r
+                  JOIN hms_case c ON c.id = r.case_id
+                  LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+                 WHERE %s %s
+                """, day("r.create_date"), dated("r.create_date"), only('hms_lab_result', 'r')),
+        }
+        # name the columns here, the first branch may not be the one aliasing them
+        return SQL(
+            "SELECT * FROM (%s) AS facts (date, department_id, doctor_id, measure)",
+            SQL(" UNION ALL ").join(
+                query for table, query in branches.items() if sources is None or sources.get(table)
+            ),
+        )
+
+    @api.model
+    def _refresh(self):
+        """Rebuild the whole table from the source records."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("DELETE FROM hms_stats_daily"))
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO hms_stats_daily (date, department_id, doctor_id, %(measures)s,
+                                         create_uid, create_date, write_uid, write_date)
+            SELECT facts.date, facts.department_id, facts.doctor_id, %(sums)s,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM (%(facts)s) AS facts
+             GROUP BY facts.date, facts.department_id, facts.doctor_id
+            """,
+            measures=SQL(", ").join(SQL.identifier(m) for m in MEASURES),
+            sums=SQL(", ").join(SQL("COUNT(*) FILTER (WHERE facts.measure = %s)", m) for m in MEASURES),
+            uid=self.env.uid,
+            facts=self._facts_query(),
+        ))
+        self.env.invalidate_all()
+
+    @api.model
+    def _count_facts(self, sources):
+        """Return a ``Counter`` of the facts of ``sources`` (``{table: ids}``),
+        keyed by ``(date, department_id, doctor_id, measure)``."""
+        if not any(sources.values()):
+            return Counter()
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT date, department_id, doctor_id, measure, COUNT(*) FROM (%s) AS facts GROUP BY 1, 2, 3, 4",
+            self._facts_query(sources),
+        ))
+        return Counter({tuple(row[:4]): row[4] for row in self.env.cr.fetchall()})
+
+    @api.model
+    def _add_deltas(self, deltas):
+        """Add the signed fact counts of ``deltas`` to the rows, creating the missing ones.
+
+        Concurrent transactions updating the same row are serialized by its
+        lock and both increments are kept.
+        """
+        rows = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+        for (date, department_id, doctor_id, measure), count in deltas.items():
+            if count:
+                rows[date, department_id, doctor_id][measure] += count
+        if not rows:
+            return
+        now = fields.Datetime.now()
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO hms_stats_daily (date, department_id, doctor_id, %(measures)s,
+                                         create_uid, create_date, write_uid, write_date)
+            VALUES %(values)s
+            ON CONFLICT (date, COALESCE(department_id, 0), COALESCE(doctor_id, 0))
+            DO UPDATE SET %(updates)s, write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+            """,
+            measures=SQL(", ").join(SQL.identifier(m) for m in MEASURES),
+            values=SQL(", ").join(
+                SQL("(%s)", SQL(", ").join(
+                    SQL("%s", value)
+                    for value in (*key, *(counts[m] for m in MEASURES), self.env.uid, now, self.env.uid, now)
+                ))
+                for key, counts in rows.items()
+            ),
+            updates=SQL(", ").join(
+                SQL("%s = hms_stats_daily.%s + EXCLUDED.%s", SQL.identifier(m), SQL.identifier(m), SQL.identifier(m))
+                for m in MEASURES
+            ),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _cron_rebuild(self):
+        started = datetime.now()
+        self._refresh()
+        _logger.info("hms.stats.daily rebuilt in %s", datetime.now() - started)
+
+    @api.model
+    def _track(self, sources, created=False):
+        """Remember the facts of ``sources`` (``{table: ids}``) before they change.
+
+        The first call for a record in a transaction counts its facts, later
+        ones are free. At commit time the facts of every tracked record are
+        counted again and the difference is added to the table.
+
+        :param created: the records are new and have no facts yet
+        """
+        pending = self.env.cr.precommit.data.get('hms.stats.daily.pending')
+        if pending is None:
+            pending = self.env.cr.precommit.data['hms.stats.daily.pending'] = {
+                'sources': defaultdict(set), 'before': Counter(),
+            }
+            self.env.cr.precommit.add(self._apply_pending)
+        fresh = {table: set(ids) - pending['sources'][table] for table, ids in sources.items()}
+        if not created:
+            pending['before'].update(self._count_facts(fresh))
+        for table, ids in fresh.items():
+            pending['sources'][table].update(ids)
+
+    @api.model
+    def _apply_pending(self):
+        pending = self.env.cr.precommit.data.pop('hms.stats.daily.pending', None)
+        if not pending:
+            return
+        deltas = self._count_facts(pending['sources'])
+        deltas.subtract(pending['before'])
+        self.sudo()._add_deltas(deltas)
+
+    @api.model
+    def _get_totals(self, start, end, groupby=()):
+        """Sum every measure of the records dated from ``start`` to ``end`` (UTC datetimes).
+
+        The whole days of the window are read from the table, the partial
+        first and last days are counted from the source records.
+
+        :param groupby: optional many2one fields to group by, e.g. ``['doctor_id']``
+        :return: list of dicts with the groupby values and one key per measure
+        """
+        groupby = list(groupby)
+        tz = pytz.timezone(self._get_tz())
+        local_start = pytz.utc.localize(start).astimezone(tz)
+        first_day = local_start.date() if local_start.time() == time.min else local_start.date() + timedelta(days=1)
+        last_day = pytz.utc.localize(end).astimezone(tz).date() - timedelta(days=1)
+
+        totals = defaultdict(Counter)
+        edges = [(start, end)]
+        if first_day <= last_day:
+            for group in self._read_group(
+                [('date', '>=', first_day), ('date', '<=', last_day)],
+                groupby=groupby,
+                aggregates=[f'{m}:sum' for m in MEASURES],
+            ):
+                keys = tuple(record.id or None for record in group[:len(groupby)])
+                totals[keys].update({m: count or 0 for m, count in zip(MEASURES, group[len(groupby):])})
+            edges = [(start, self._day_start(first_day)), (self._day_start(last_day + timedelta(days=1)), end)]
+
+        self.env.flush_all()
+        keys = [SQL.identifier('facts', name) for name in groupby] + [SQL("facts.measure")]
+        for edge_start, edge_end in edges:
+            if edge_start >= edge_end:
+                continue
+            self.env.cr.execute(SQL(
+                "SELECT %s, COUNT(*) FROM (%s) AS facts GROUP BY %s",
+                SQL(", ").join(keys),
+                self._facts_query(window=(edge_start, edge_end)),
+                SQL(", ").join(keys),
+            ))
+            for *group_keys, measure, count in self.env.cr.fetchall():
+                totals[tuple(group_keys)][measure] += count
+
+        return [
+            dict(
+                {name: self.env[self._fields[name].comodel_name].browse(key) for name, key in zip(groupby, keys)},
+                **{m: counts[m] for m in MEASURES},
+            )
+            for keys, counts in totals.items()
+        ]
+
+    @api.model
+    def _get_series(self, measure, first_day, last_day):
+        """Return ``[(date, total)]`` of ``measure`` for every day of the range."""
+        totals = dict(self._read_group(
+            [('date', '>=', first_day), ('date', '<=', last_day)],
+            groupby=['date:day'],
+            aggregates=[f'{measure}:sum'],
+        ))
+        return [
+            (day, totals.get(day, 0) or 0)
+            for day in (fields.Date.add(first_day, days=offset) for offset in range((last_day - first_day).days + 1))
+        ]
+
+
+class HmsStatsMixin(models.AbstractModel):
+    """Keep ``hms.stats.daily`` in sync with the records of a source model.
+
+    Created and deleted records, and writes touching ``_stats_fields``, are
+    tracked so their change is applied to the statistics at commit time.
+    """
+    _name = 'hms.stats.mixin'
+    _description = 'HMS Daily Statistics Source'
+
+    _stats_fields = ()
+
+    def _stats_sources(self):
+        """Return ``{table: ids}`` of the records whose facts depend on ``self``."""
+        return {self._table: set(self.ids)}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hms.stats.daily']._track(records._stats_sources(), created=True)
+        return records
+
+    def write(self, vals):
+        if any(field_name in vals for field_name in self._stats_fields):
+            self.env['hms.stats.daily']._track(self._stats_sources())
+        return super().write(vals)
+
+    def unlink(self):
+        self.env['hms.stats.daily']._track(self._stats_sources())
+        return super().unlink()
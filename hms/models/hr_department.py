@@ -1,6 +1,22 @@
-from odoo import models, fields
+from odoo import models, fields, api
+
+from .hms_counter import init_counter
 
 class HrDepartment(models.Model):
     _inherit = "hr.department"
 
-    is_hospital = fields.Boolean(string="Hospital Department", default=False)
\ No newline at end of file
+    is_hospital = fields.Boolean(string="Hospital Department", default=False)
+    hms_room_sequence = fields.Integer(string="Last Room Number", readonly=True, copy=False)
+    hms_room_ids = fields.One2many("hms.room", "department_id", string="Rooms")
+    hms_beds_total = fields.Integer(string="Beds (Total)", compute="_compute_hms_beds", store=True)
+    hms_beds_available = fields.Integer(string="Beds (Available)", compute="_compute_hms_beds", store=True)
+
+    @api.depends("hms_room_ids.beds_total", "hms_room_ids.number_of_available_beds", "hms_room_ids.out_of_service")
+    def _compute_hms_beds(self):
+        for department in self:
+            rooms = department.hms_room_ids
+            department.hms_beds_total = sum(rooms.mapped("beds_total"))
+            department.hms_beds_available = sum(rooms.filtered(lambda r: not r.out_of_service).mapped("number_of_available_beds"))
+
+    def init(self):
+        init_counter(self.env.cr, self._table, 'hms_room_sequence', 'hms_room', 'department_id')
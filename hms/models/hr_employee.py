@@ -30,35 +30,48 @@ class HrEmployee(models.Model):
     @api.onchange('user_id', 'hms_role_id')
     def _assign_hms_groups(self):
         """Assign HMS role group to user without overwriting other groups."""
+        base_groups = (
+            self.env.ref('base.group_user')
+            | self.env.ref('stock.group_stock_user')
+            | self.env.ref('account.group_account_invoice')
+            | self.env.ref('hr.group_hr_user')
+            | self.env.ref('sales_team.group_sale_manager')
+            | self.env.ref('project.group_project_user')
+            | self.env.ref('hr_timesheet.group_hr_timesheet_user')
+        )
         for employee in self:
             if employee.user_id:
-                base_group = self.env.ref('base.group_user')
-                inventory = self.env.ref('stock.group_stock_user')
-                accounting = self.env.ref('account.group_account_invoice')
-                hr = self.env.ref('hr.group_hr_user')
-                sales_team = self.env.ref('sales_team.group_sale_manager')
-                project = self.env.ref('project.group_project_user')
-                timesheet = self.env.ref('hr_timesheet.group_hr_timesheet_user')
-                employee.user_id.group_ids = [(6, 0, [base_group.id, inventory.id, accounting.id, hr.id, sales_team.id, project.id, timesheet.id])]
-                if employee.hms_role_id and employee.hms_role_id.group_id:
-                    # Replace only the HMS group, keep others
-                    employee.user_id.group_ids = [(4, employee.hms_role_id.group_id.id)]
-                else:
-                    # Remove HMS group if no role
-                    employee.user_id.group_ids = [(3, employee.hms_role_id.group_id.id)] if employee.hms_role_id else []
+                groups = base_groups | employee.hms_role_id.group_id
+                # Writing the groups clears the registry caches, skip it when they are right
+                if employee.user_id.group_ids != groups:
+                    employee.user_id.group_ids = [(6, 0, groups.ids)]
     @api.model
     def create(self, vals):
         """Ensure HMS group assignment on creation."""
         employee = super().create(vals)
         employee._assign_hms_groups()
+        if employee.hms_role_id:
+            # refresh hms.role directory
+            self.env.registry.clear_cache()
         return employee
 
     def write(self, vals):
         """Ensure HMS group assignment on update."""
+        directory_fields = [field for field in ('hms_role_id', 'user_id', 'active') if field in vals]
+        before = {employee.id: [employee[field] for field in directory_fields] for employee in self}
         res = super().write(vals)
-        self._assign_hms_groups()
+        if 'user_id' in vals or 'hms_role_id' in vals:
+            self._assign_hms_groups()
+        if any(before[employee.id] != [employee[field] for field in directory_fields] for employee in self):
+            # refresh hms.role directory
+            self.env.registry.clear_cache()
         return res
 
+    def unlink(self):
+        if self.filtered('hms_role_id'):
+            self.env.registry.clear_cache()
+        return super().unlink()
+
 
     def action_open_password_wizard(self):
         return {
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+# Models whose notification mails are retried when delivery fails.
+HMS_MAIL_MODELS = ('hms.appointment', 'hms.prescription')
+MAIL_MAX_RETRIES = 5
+MAIL_RETRY_DELAY = timedelta(minutes=5)
+
+
+class MailMail(models.Model):
+    _inherit = 'mail.mail'
+
+    hms_retry_count = fields.Integer(string='HMS Delivery Retries', default=0, readonly=True)
+
+    @api.model
+    def _cron_retry_hms_mail(self, limit=1000):
+        """Requeue HMS notifications that failed on a transient error.
+
+        The n-th retry is scheduled ``MAIL_RETRY_DELAY * 2 ** n`` later and sent
+        in batches by the standard mail queue cron.
+        """
+        failed = self.sudo().search([
+            ('state', '=', 'exception'),
+            ('model', 'in', HMS_MAIL_MODELS),
+            ('failure_type', 'in', (False, 'unknown', 'mail_smtp')),
+            ('hms_retry_count', '<', MAIL_MAX_RETRIES),
+        ], limit=limit)
+        now = fields.Datetime.now()
+        retry_dates = []
+        for retry_count, mails in failed.grouped('hms_retry_count').items():
+            scheduled_date = now + MAIL_RETRY_DELAY * 2 ** retry_count
+            mails.write({
+                'state': 'outgoing',
+                'hms_retry_count': retry_count + 1,
+                'scheduled_date': scheduled_date,
+            })
+            retry_dates.append(scheduled_date)
+        if retry_dates:
+            self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger(retry_dates)
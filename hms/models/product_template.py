@@ -1,6 +1,8 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+from .hms_drug_safety import PROFILE_FIELDS
+
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
 
@@ -27,6 +29,25 @@ class ProductTemplate(models.Model):
         'product.product', string="Interfering Medications",
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        if any(field_name in vals for vals in vals_list for field_name in PROFILE_FIELDS):
+            self.env.registry.clear_cache()
+        return templates
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field_name in vals for field_name in PROFILE_FIELDS):
+            # the safety map of hms.drug.safety is cached per registry
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.constrains('is_medicine', 'is_lab_test')
     def _check_is_medicine_and_lab_test_mutually_exclusive(self):
         for record in self:
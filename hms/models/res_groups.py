@@ -0,0 +1,12 @@
+from odoo import models
+
+
+class ResGroups(models.Model):
+    _inherit = 'res.groups'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'user_ids', 'implied_ids'} & set(vals):
+            # the cached capabilities of hms.role depend on the group members
+            self.env.registry.clear_cache()
+        return res
@@ -1,9 +1,13 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 
+from .hms_dashboard_cache import ALL_ROLES
+
 
 class ResPartner(models.Model):
-    _inherit = "res.partner"
+    _inherit = ["res.partner", "hms.stats.mixin", "hms.dashboard.cache.mixin"]
+    _stats_fields = ("is_patient", "active")
+    _dashboard_cache_fields = ("name", "phone", "is_patient", "outsider_patient", "active")
 
     # Patient-related
     is_patient = fields.Boolean(string="Is Patient")
@@ -47,6 +51,12 @@ class ResPartner(models.Model):
                                       help="Patient registered through the registration page")
     
 
+    def _dashboard_cache_targets(self):
+        # recent and registered patients are listed on every dashboard
+        if not any(self.mapped('is_patient')):
+            return {}
+        return {'dashboard': ((), ALL_ROLES)}
+
     def _compute_is_staff(self):
         for partner in self:
             # Count employees linked to this partner AND having an HMS role
@@ -80,10 +90,10 @@ class ResPartner(models.Model):
 
     @api.depends('is_patient', 'medical_record_id')
     def _compute_show_create_medical_record(self):
+        can_edit = 'edit_patients' in self.env['hms.role'].get_capabilities()
         for partner in self:
             partner.show_create_medical_record = (
-                (partner.is_patient and not partner.medical_record_id
-                 and (self.env.user.has_group('hms.group_hms_receptionist') or self.env.user.has_group('base.group_system')))
+                (partner.is_patient and not partner.medical_record_id and can_edit)
             )
 
     def action_grant_portal_access(self):
@@ -125,10 +135,9 @@ class ResPartner(models.Model):
 
     @api.depends('is_patient', 'medical_record_id')
     def _compute_can_edit_patient(self):
+        can_edit = 'edit_patients' in self.env['hms.role'].get_capabilities()
         for partner in self:
-            partner.can_edit_patient = (
-                partner.is_patient and
-                (self.env.user.has_group('hms.group_hms_receptionist') or self.env.user.has_group('base.group_system')))
+            partner.can_edit_patient = partner.is_patient and can_edit
             
 
     def send_patient_email(self, subject, message):
@@ -0,0 +1,12 @@
+from odoo import models
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(key == 'group_ids' or key.startswith(('in_group_', 'sel_groups_')) for key in vals):
+            # the cached capabilities of hms.role depend on the user groups
+            self.env.registry.clear_cache()
+        return res
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from odoo import api, models, fields
+from odoo.tools import SQL
 from dateutil.relativedelta import relativedelta
 
 # ↓↓↓ إضافات مهمة لدوال التنسيق ↓↓↓
@@ -18,81 +19,45 @@ class ReportAdminSummary30d(models.AbstractModel):
         now = fields.Datetime.now()
         start = now - relativedelta(days=30)
 
-        Partner = self.env['res.partner'].sudo()
         Case = self.env['hms.case'].sudo()
-        Appt = self.env['hms.appointment'].sudo()
-        Pres = self.env['hms.prescription'].sudo()
-        LabReq = self.env['hms.lab.request'].sudo()
-        LabRes = self.env['hms.lab.result'].sudo()
+        Stats = self.env['hms.stats.daily'].sudo()
 
-        # KPIs
+        # KPIs (daily statistics for the whole days, source records for the partial ones)
+        totals = Stats._get_totals(start, now)
+        totals = totals[0] if totals else {}
         kpis = {
-            'patients_new': Partner.search_count([
-                ('is_patient', '=', True),
-                ('create_date', '>=', start), ('create_date', '<=', now)
-            ]),
-            'admissions': Case.search_count([
-                ('admission_date', '>=', start), ('admission_date', '<=', now)
-            ]),
-            'discharges': Case.search_count([
-                ('discharge_date', '>=', start), ('discharge_date', '<=', now)
-            ]),
+            'patients_new': totals.get('patients_new', 0),
+            'admissions': totals.get('admissions', 0),
+            'discharges': totals.get('discharges', 0),
             'active_cases': Case.search_count([('state', '=', 'active')]),
-            'appointments_confirmed': Appt.search_count([
-                ('date', '>=', start), ('date', '<=', now),
-                ('state', '=', 'confirmed')
-            ]),
-            'prescriptions': Pres.search_count([
-                ('date', '>=', start), ('date', '<=', now)
-            ]),
-            'lab_requests': LabReq.search_count([
-                ('date_requested', '>=', start), ('date_requested', '<=', now)
-            ]),
-            'lab_results': LabRes.search_count([
-                ('create_date', '>=', start), ('create_date', '<=', now)
-            ]),
+            'appointments_confirmed': totals.get('appointments_confirmed', 0),
+            'prescriptions': totals.get('prescriptions', 0),
+            'lab_requests': totals.get('lab_requests', 0),
+            'lab_results': totals.get('lab_results', 0),
         }
 
         # Top 5 Doctors by Admissions
-        top_doctors = []
-        try:
-            groups = Case.read_group(
-                [('admission_date', '>=', start), ('admission_date', '<=', now)],
-                ['id:count'], ['main_doctor_id'], limit=5, orderby='id_count desc'
-            )
-            for g in groups:
-                if g.get('main_doctor_id'):
-                    top_doctors.append({
-                        'doctor_id': int(g['main_doctor_id'][0]),
-                        'doctor_name': g['main_doctor_id'][1],
-                        'count': g.get('id_count', 0),
-                    })
-        except Exception:
-            top_doctors = []
+        per_doctor = Stats._get_totals(start, now, groupby=['doctor_id'])
+        per_doctor = sorted(
+            (row for row in per_doctor if row['doctor_id'] and row['admissions']),
+            key=lambda row: row['admissions'], reverse=True,
+        )[:5]
+        top_doctors = [{
+            'doctor_id': row['doctor_id'].id,
+            'doctor_name': row['doctor_id'].name,
+            'count': row['admissions'],
+        } for row in per_doctor]
 
-        # Average Length of Stay
-        los_days = 0.0
-        los_count = 0
-        closed_cases = Case.search([
-            ('discharge_date', '>=', start), ('discharge_date', '<=', now),
-            ('admission_date', '!=', False)
-        ], limit=5000)
-        for c in closed_cases:
-            try:
-                delta = (c.discharge_date or c.create_date) - (c.admission_date or c.create_date)
-                if delta:
-                    los_days += (delta.total_seconds() / 86400.0)
-                    los_count += 1
-            except Exception:
-                continue
-        avg_los = round(los_days / los_count, 2) if los_count else 0.0
+        # Length of Stay (no row cap, computed in SQL)
+        los = self._get_los_stats(start, now)
 
         return {
             'start': start,
             'end': now,
             'company': self.env.company,
             'kpis': kpis,
-            'avg_los': avg_los,
+            'avg_los': los['overall']['avg'],
+            'los': los,
             'top_doctors': top_doctors,
 
             # ↓↓↓ نمرّر دوال التنسيق للقالب QWeb ↓↓↓
@@ -100,3 +65,52 @@ class ReportAdminSummary30d(models.AbstractModel):
             'format_datetime':  lambda dt, tz=False, lang_code=False: odoo_format_datetime(self.env, dt, tz=tz or (self.env.user.tz or False), lang_code=lang_code),
             'formatLang':       lambda value, digits=None, grouping=True, monetary=False, currency=None: odoo_format_lang(self.env, value, digits=digits, grouping=grouping, monetary=monetary, currency_obj=currency),
         }
+
+    @api.model
+    def _get_los_stats(self, start, end):
+        """Length of stay (in days) of the cases discharged between ``start`` and ``end``.
+
+        Returns the count, average, median and 90th percentile overall, per
+        department of the main doctor and per main doctor, in one query.
+        """
+        self.env['hms.case'].flush_model(['admission_date', 'discharge_date', 'main_doctor_id'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT GROUPING(e.department_id) AS by_department_off,
+                   GROUPING(c.main_doctor_id) AS by_doctor_off,
+                   e.department_id, c.main_doctor_id,
+                   COUNT(*) AS count,
+                   AVG(los.days) AS avg,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY los.days) AS median,
+                   percentile_cont(0.9) WITHIN GROUP (ORDER BY los.days) AS p90
+              FROM hms_case c
+              LEFT JOIN hr_employee e ON e.id = c.main_doctor_id
+             CROSS JOIN LATERAL (
+                   SELECT EXTRACT(EPOCH FROM c.discharge_date - c.admission_date) / 86400.0 AS days
+             ) los
+             WHERE c.discharge_date >= %s AND c.discharge_date <= %s
+               AND c.admission_date IS NOT NULL
+             GROUP BY GROUPING SETS ((), (e.department_id), (c.main_doctor_id))
+            """,
+            start, end,
+        ))
+        empty = {'count': 0, 'avg': 0.0, 'median': 0.0, 'p90': 0.0}
+        result = {'overall': dict(empty), 'by_department': [], 'by_doctor': []}
+        for row in self.env.cr.dictfetchall():
+            stats = {
+                'count': row['count'],
+                'avg': round(float(row['avg'] or 0.0), 2),
+                'median': round(float(row['median'] or 0.0), 2),
+                'p90': round(float(row['p90'] or 0.0), 2),
+            }
+            if row['by_department_off'] and row['by_doctor_off']:
+                result['overall'] = stats
+            elif not row['by_department_off']:
+                stats['department'] = self.env['hr.department'].sudo().browse(row['department_id'])
+                result['by_department'].append(stats)
+            else:
+                stats['doctor'] = self.env['hr.employee'].sudo().browse(row['main_doctor_id'])
+                result['by_doctor'].append(stats)
+        for key in ('by_department', 'by_doctor'):
+            result[key].sort(key=lambda stats: stats['count'], reverse=True)
+        return result
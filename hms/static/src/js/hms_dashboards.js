@@ -1,5 +1,5 @@
 import { registry } from "@web/core/registry";
-import { Component, onWillStart, onMounted, useState, useRef } from "@odoo/owl";
+import { Component, onWillStart, onMounted, onWillUnmount, useState, useRef } from "@odoo/owl";
 import { useService } from "@web/core/utils/hooks";
 import { markup } from "@odoo/owl";
 
@@ -7,6 +7,7 @@ class HmsDashboard extends Component {
     setup() {
         this.orm = useService("orm");
         this.action = useService("action");
+        this.busService = useService("bus_service");
 
         this.caseChartRef = useRef("caseChart");
         this.trendChartRef = useRef("trendChart");
@@ -31,6 +32,22 @@ class HmsDashboard extends Component {
         onMounted(() => {
             this._renderCharts();
         });
+
+        // Live free bed counters, pushed by hms.bed on every state change
+        const onBedBoardUpdate = (payload) => this._onBedBoardUpdate(payload);
+        this.busService.subscribe("hms.bed_board/update", onBedBoardUpdate);
+        onWillUnmount(() => this.busService.unsubscribe("hms.bed_board/update", onBedBoardUpdate));
+    }
+
+    _onBedBoardUpdate(payload) {
+        const rows = this.state.kpi_data.free_beds || [];
+        for (const department of payload.departments || []) {
+            const row = rows.find((r) => r.id === department.id);
+            if (row) {
+                row.free = department.free;
+                row.total = department.total;
+            }
+        }
     }
 
     _renderCharts() {